@@ -70,6 +70,7 @@ CREATE TABLE energy_platform (
     api_key VARCHAR(200) COMMENT 'API密钥',
     status TINYINT DEFAULT 0 COMMENT '状态：0-正常，1-暂停',
     seq_sn INT DEFAULT 0 COMMENT '排序序号',
+    poll_group VARCHAR(200) DEFAULT '' COMMENT '轮询分组，多个用逗号分隔，为空时服务全部分组',
     create_time DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     update_time DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
 
@@ -144,10 +145,15 @@ CREATE TABLE energy_wallet_trade_list (
     tg_notice_status_send VARCHAR(1) DEFAULT 'N' COMMENT '发送通知状态：Y-已发送，N-未发送',
     energy_amount BIGINT DEFAULT 0 COMMENT '能量数量',
     bot_token VARCHAR(200) COMMENT '机器人Token',
+    worker_id VARCHAR(100) COMMENT '认领标识（主机名:进程号:随机串）',
+    lease_expire_time DATETIME COMMENT '认领租约到期时间，过期后恢复为待处理',
     create_time DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     update_time DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
 
     UNIQUE KEY uk_tx_hash (tx_hash),
+    INDEX idx_worker_id (worker_id),
+    INDEX idx_status_lease (process_status, lease_expire_time),
+    INDEX idx_status_coin_to (process_status, coin_name, transferto_address),
     INDEX idx_wallet_addr (wallet_addr),
     INDEX idx_transferto_address (transferto_address),
     INDEX idx_process_status (process_status),
@@ -155,7 +161,41 @@ CREATE TABLE energy_wallet_trade_list (
     INDEX idx_tg_uid (tg_uid)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='能量钱包交易列表表';
 
--- 8. 插入基础数据
+-- 8. 能量钱包交易拉取游标表 (区块扫描模式使用 receive_wallet='*' 的全局游标)
+CREATE TABLE energy_wallet_trade_cursor (
+    rid BIGINT PRIMARY KEY AUTO_INCREMENT COMMENT '主键ID',
+    receive_wallet VARCHAR(100) NOT NULL COMMENT '收款钱包地址',
+    coin_name VARCHAR(20) NOT NULL COMMENT '币种名称',
+    last_block_timestamp BIGINT NOT NULL DEFAULT 0 COMMENT '已拉取到的最新区块时间戳（毫秒）',
+    last_block_number BIGINT NOT NULL DEFAULT 0 COMMENT '已扫描到的最新区块号（区块扫描模式）',
+    create_time DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    update_time DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+
+    UNIQUE KEY uk_wallet_coin (receive_wallet, coin_name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='能量钱包交易拉取游标表';
+
+-- 9. Telegram消息发件箱表 (发送成功后才标记已发送)
+CREATE TABLE energy_tg_outbox (
+    rid BIGINT PRIMARY KEY AUTO_INCREMENT COMMENT '主键ID',
+    bot_token VARCHAR(200) NOT NULL COMMENT '机器人Token',
+    chat_id VARCHAR(50) NOT NULL COMMENT '接收者chat_id',
+    message TEXT NOT NULL COMMENT '消息内容（HTML）',
+    reply_markup TEXT COMMENT '键盘（JSON）',
+    status TINYINT DEFAULT 0 COMMENT '状态：0-待发送，1-已发送，2-发送失败，3-发送中',
+    attempts INT DEFAULT 0 COMMENT '已尝试次数',
+    next_attempt_time DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '下次发送时间',
+    worker_id VARCHAR(100) COMMENT '认领标识（发送中）',
+    lease_expire_time DATETIME COMMENT '认领租约到期时间，过期后可被重新认领',
+    last_error VARCHAR(500) COMMENT '最后一次错误',
+    sent_time DATETIME COMMENT '发送成功时间',
+    create_time DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    update_time DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+
+    INDEX idx_status_next (status, next_attempt_time),
+    INDEX idx_worker_id (worker_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Telegram消息发件箱表';
+
+-- 10. 插入基础数据
 
 -- 插入能量平台数据
 INSERT INTO energy_platform (platform_name, platform_balance, status, seq_sn) VALUES
@@ -32,15 +32,19 @@ from telegram.ext import (
 from energy_rental_bot.config.config import TELEGRAM_CONFIG, TASK_CONFIG, ENERGY_RENT_CONFIG, BISHA_CONFIG
 from energy_rental_bot.controllers.energy_controller import TrongasIoController
 from energy_rental_bot.models.energy_models import (
-    EnergyAiBishuModel,
-    EnergyAiTrusteeshipModel,
+    AsyncEnergyAiBishuModel,
+    AsyncEnergyAiTrusteeshipModel,
     EnergyWalletTradeListModel
 )
 from energy_rental_bot.tasks.handle_energy_order_task import HandleEnergyOrderTask
 from energy_rental_bot.tasks.get_energy_wallet_trx_trade_task import GetEnergyWalletTrxTradeTask
+from energy_rental_bot.tasks.scan_energy_wallet_block_task import ScanEnergyWalletBlockTask
 from energy_rental_bot.tasks.handle_ai_energy_order_task import HandleAiEnergyOrderTask
+from energy_rental_bot.tasks.get_ai_trusteeship_wallet_resource_task import GetAiTrusteeshipWalletResourceTask
 from energy_rental_bot.tasks.send_energy_tg_message_task import SendEnergyTgMessageTask
-from energy_rental_bot.utils.energy_utils import EnergyUtils
+from energy_rental_bot.tasks.energy_order_pipeline import EnergyOrderPipeline
+from energy_rental_bot.tasks.telegram_outbox_sender import TelegramOutboxSender
+from energy_rental_bot.utils.energy_utils import EnergyUtils, AsyncDatabaseConnection, ApiKeyPool
 
 
 class EnergyRentalBot:
@@ -59,6 +63,13 @@ class EnergyRentalBot:
         # 任务调度器
         self.scheduler_task = None
 
+        # 钱包资源检查循环 (独立于分钟任务，不阻塞下单与通知)
+        self.resource_task = None
+
+        # Telegram发件箱发送器
+        self.outbox_sender = None
+        self.outbox_task = None
+
     async def initialize(self) -> None:
         """初始化机器人"""
         try:
@@ -90,10 +101,20 @@ class EnergyRentalBot:
 
     async def _post_init(self, application: Application) -> None:
         """机器人启动后的初始化"""
+        # 启动订单事件管道
+        EnergyOrderPipeline.start()
+
+        # 启动Telegram发件箱发送器
+        self.outbox_sender = TelegramOutboxSender()
+        self.outbox_task = asyncio.create_task(self.outbox_sender.run())
+
         # 启动后台任务调度器
         self.scheduler_task = asyncio.create_task(self._scheduler_loop())
         self.logger.info("后台任务调度器已启动")
 
+        # 启动钱包资源检查循环
+        self.resource_task = asyncio.create_task(self._resource_check_loop())
+
     async def _register_handlers(self) -> None:
         """注册消息处理器"""
         if not self.application:
@@ -139,16 +160,33 @@ class EnergyRentalBot:
 
     async def stop(self) -> None:
         """停止机器人"""
-        if self.scheduler_task:
-            self.scheduler_task.cancel()
+        for task in (self.scheduler_task, self.resource_task):
+            if not task:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        # 停止Telegram发件箱发送器 (未发送的消息保留在发件箱中，下次启动继续发送)
+        if self.outbox_task:
+            self.outbox_sender.stop()
+            self.outbox_task.cancel()
             try:
-                await self.scheduler_task
+                await self.outbox_task
             except asyncio.CancelledError:
                 pass
 
         if self.application:
             await self.application.shutdown()
 
+        # 停止订单事件管道
+        EnergyOrderPipeline.stop()
+
+        # 关闭异步数据库连接池
+        await AsyncDatabaseConnection.close_pool()
+
         self.logger.info("能量租赁机器人已停止")
 
     async def _scheduler_loop(self) -> None:
@@ -204,8 +242,11 @@ class EnergyRentalBot:
     def _execute_minute_logic(self):
         """同步执行的分钟逻辑"""
         try:
-            # 获取TRX交易数据
-            trx_task = GetEnergyWalletTrxTradeTask()
+            # 获取交易数据：区块扫描模式一次覆盖全部收款钱包，否则按钱包轮询
+            if TASK_CONFIG['ingest']['mode'] == 'block_scan':
+                trx_task = ScanEnergyWalletBlockTask()
+            else:
+                trx_task = GetEnergyWalletTrxTradeTask()
             trx_task.execute()
         except Exception as e:
             self.logger.error(f"TRX交易任务失败: {e}")
@@ -224,6 +265,19 @@ class EnergyRentalBot:
         except Exception as e:
             self.logger.error(f"通知任务失败: {e}")
 
+    async def _resource_check_loop(self) -> None:
+        """钱包资源检查循环 (调度器只挑选到期的钱包；冷启动全量检查耗时较长，单独运行以免阻塞分钟任务)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, GetAiTrusteeshipWalletResourceTask().execute)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self.logger.error(f"钱包资源检查任务失败: {e}")
+
+            await asyncio.sleep(TASK_CONFIG['resource_check']['loop_interval'])
+
     async def _run_ten_minute_tasks(self) -> None:
         loop = asyncio.get_running_loop()
         await loop.run_in_executor(None, self._execute_ten_minute_logic)
@@ -348,11 +402,13 @@ class EnergyRentalBot:
             return
 
         # 查询用户的托管和笔数套餐状态
-        trusteeship_model = EnergyAiTrusteeshipModel()
-        bishu_model = EnergyAiBishuModel()
+        trusteeship_model = AsyncEnergyAiTrusteeshipModel()
+        bishu_model = AsyncEnergyAiBishuModel()
 
-        trusteeship_data = trusteeship_model.get_by_wallet_addr(f"user_{user.id}")
-        bishu_data = bishu_model.get_by_wallet_addr(f"user_{user.id}")
+        trusteeship_data, bishu_data = await asyncio.gather(
+            trusteeship_model.get_by_wallet_addr(f"user_{user.id}"),
+            bishu_model.get_by_wallet_addr(f"user_{user.id}")
+        )
 
         status_text = f"📊 <b>{user.first_name} 的账户状态</b>\n\n"
 
@@ -915,6 +971,11 @@ class EnergyRentalBot:
         text = "📈 <b>系统统计</b>\n\n正在获取统计数据..."
         await query.edit_message_text(text, parse_mode='HTML')
 
+        # API Key 健康状况
+        key_stats = ApiKeyPool.get_stats()
+        healthy_keys = sum(1 for item in key_stats if not item['quarantined_seconds'])
+        api_status = f"正常 ({healthy_keys}/{len(key_stats)} 个Key可用)" if key_stats else "正常"
+
         # 这里应该实现真正的统计逻辑
         stats_text = (
             "📈 <b>系统统计</b>\n\n"
@@ -925,7 +986,7 @@ class EnergyRentalBot:
             f"• 总收入：{0} TRX\n\n"
             "<b>系统状态：</b>\n"
             "• 数据库：正常\n"
-            "• API服务：正常\n"
+            f"• API服务：{api_status}\n"
             "• 机器人：运行中"
         )
 
@@ -1002,11 +1063,13 @@ class EnergyRentalBot:
             return
 
         # 查询钱包状态
-        trusteeship_model = EnergyAiTrusteeshipModel()
-        bishu_model = EnergyAiBishuModel()
+        trusteeship_model = AsyncEnergyAiTrusteeshipModel()
+        bishu_model = AsyncEnergyAiBishuModel()
 
-        trusteeship_data = trusteeship_model.get_by_wallet_addr(wallet_address)
-        bishu_data = bishu_model.get_by_wallet_addr(wallet_address)
+        trusteeship_data, bishu_data = await asyncio.gather(
+            trusteeship_model.get_by_wallet_addr(wallet_address),
+            bishu_model.get_by_wallet_addr(wallet_address)
+        )
 
         status_text = f"📊 <b>钱包状态查询</b>\n\n"
         status_text += f"🏠 <b>钱包地址：</b>\n<code>{wallet_address}</code>\n\n"
@@ -1097,8 +1160,8 @@ class EnergyRentalBot:
         """设置笔数套餐"""
         try:
             # 检查是否已存在
-            bishu_model = EnergyAiBishuModel()
-            existing = bishu_model.get_by_wallet_addr(wallet_address)
+            bishu_model = AsyncEnergyAiBishuModel()
+            existing = await bishu_model.get_by_wallet_addr(wallet_address)
 
             if existing:
                 await update.message.reply_text(
@@ -1124,7 +1187,7 @@ class EnergyRentalBot:
                 'create_time': EnergyUtils.now_date()
             }
 
-            bishu_model.insert(insert_data)
+            await bishu_model.insert(insert_data)
 
             success_text = (
                 "✅ <b>笔数套餐设置成功！</b>\n\n"
@@ -1178,11 +1241,13 @@ class EnergyRentalBot:
     async def _handle_status_via_query(self, query, user):
         """通过query处理状态查询"""
         # 复用状态处理逻辑
-        trusteeship_model = EnergyAiTrusteeshipModel()
-        bishu_model = EnergyAiBishuModel()
+        trusteeship_model = AsyncEnergyAiTrusteeshipModel()
+        bishu_model = AsyncEnergyAiBishuModel()
 
-        trusteeship_data = trusteeship_model.get_by_wallet_addr(f"user_{user.id}")
-        bishu_data = bishu_model.get_by_wallet_addr(f"user_{user.id}")
+        trusteeship_data, bishu_data = await asyncio.gather(
+            trusteeship_model.get_by_wallet_addr(f"user_{user.id}"),
+            bishu_model.get_by_wallet_addr(f"user_{user.id}")
+        )
 
         status_text = f"📊 <b>{user.first_name} 的账户状态</b>\n\n"
 
@@ -1276,8 +1341,8 @@ class EnergyRentalBot:
     async def _handle_status_via_message(self, update, user):
         """通过消息处理状态查询"""
         # 查询笔数套餐状态
-        bishu_model = EnergyAiBishuModel()
-        bishu_data = bishu_model.get_by_wallet_addr(f"user_{user.id}")
+        bishu_model = AsyncEnergyAiBishuModel()
+        bishu_data = await bishu_model.get_by_wallet_addr(f"user_{user.id}")
 
         status_text = f"📊 <b>{user.first_name} 的账户状态</b>\n\n"
 
@@ -18,7 +18,8 @@ DATABASE_CONFIG = {
     'port': int(os.getenv('DB_PORT', 3306)),
     'database': os.getenv('DB_NAME', 'energy_bot'),
     'username': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'password')
+    'password': os.getenv('DB_PASSWORD', 'password'),
+    'async_pool_size': int(os.getenv('DB_ASYNC_POOL_SIZE', 20))  # 异步连接池大小 (Telegram处理器使用)
 }
 
 # TRON网络配置
@@ -38,9 +39,45 @@ TRON_CONFIG = {
     'networks': {
         'mainnet': 'https://api.trongrid.io',
         'testnet': 'https://api.shasta.trongrid.io'
+    },
+    # 每个API Key的限流额度 (次/秒)，anonymous_rate 为未配置key时的额度
+    'rate_limits': {
+        'tronapikey': {'rate': 5, 'burst': 5, 'anonymous_rate': 1},
+        'gridapikey': {'rate': 15, 'burst': 15, 'anonymous_rate': 1}
+    },
+    # API Key 健康检查：429/401 或连续失败时隔离，隔离时间随连续失败次数指数增长
+    'key_health': {
+        'failure_threshold': 3,        # 网络异常/5xx 连续失败多少次后隔离
+        'rate_limited_backoff': 30,    # 429 基础隔离时间（秒）
+        'unauthorized_backoff': 300,   # 401/403 基础隔离时间（秒）
+        'max_backoff': 3600,           # 最长隔离时间（秒）
+        'latency_alpha': 0.2           # 平均延迟的指数平滑系数
+    },
+    # TRX入账数据源：按顺序使用，前一个失败时切换到下一个
+    'transfer_sources': {
+        'trx': ['tronscan', 'trongrid'],
+        'cross_check': False  # 是否每次请求全部数据源并交叉核对
+    },
+    # 区块扫描入账配置 (TASK_CONFIG['ingest']['mode'] = 'block_scan' 时生效)
+    'block_scan': {
+        'confirmations': 20,             # 只扫描已确认的区块
+        'batch_blocks': 100,             # 每次请求的区块数 (getblockbylimitnext 上限100)
+        'max_blocks_per_cycle': 1200,    # 每轮最多扫描的区块数
+        'event_page_limit': 200,         # USDT事件每页数量
+        'max_event_pages': 50,           # 每轮最多拉取的USDT事件页数
+        'usdt_contract': 'TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t'
     }
 }
 
+# HTTP客户端配置 (进程内共享连接池)
+HTTP_CONFIG = {
+    'pool_connections': int(os.getenv('HTTP_POOL_CONNECTIONS', 20)),  # 缓存连接池的主机数
+    'pool_maxsize': int(os.getenv('HTTP_POOL_MAXSIZE', 50)),          # 每个主机保持的最大连接数
+    'async_workers': int(os.getenv('HTTP_ASYNC_WORKERS', 50)),        # 异步请求使用的线程数
+    'connect_timeout': 5,   # 连接超时（秒）
+    'read_timeout': 10      # 读取超时（秒）
+}
+
 # Telegram配置
 TELEGRAM_CONFIG = {
     'bots': [
@@ -71,30 +108,112 @@ TASK_CONFIG = {
         'check_resources': 600,    # 每10分钟检查资源
         'handle_ai_orders': 600,   # 每10分钟处理AI订单
         'send_notifications': 60   # 每分钟发送通知
+    },
+    'ingest': {
+        'mode': os.getenv('INGEST_MODE', 'poll'),  # poll-按收款钱包轮询，block_scan-扫描区块一次覆盖全部收款钱包
+        'initial_lookback': 3600,  # 无游标时首次回溯时间（秒）
+        'cursor_overlap': 60,      # 每次拉取在游标基础上的重叠回溯（秒），防止接口入库延迟漏单
+        'max_pages_per_cycle': 20,  # 每个钱包每轮最多拉取的分页数，剩余交易下轮继续
+        'wallet_timeout': 120       # 单个钱包每轮拉取入库的超时（秒），超时不推进游标，下轮继续
+    },
+    'resource_check': {
+        'concurrency': int(os.getenv('RESOURCE_CHECK_CONCURRENCY', 20)),  # 同时查询钱包资源的请求数
+        'batch_size': 200,     # 每批合并为一条 UPDATE 写回的钱包数
+        'snapshot_size': 20000,  # 内存中保留的钱包资源快照数量 (LRU)，资源未变化的钱包不写库
+        'loop_interval': 30,   # 资源检查循环的间隔（秒），独立于分钟任务运行
+        # 自适应轮询：按能量消耗速度预测到达阈值的时间，在此之前安排下次检查
+        'min_interval': 60,      # 最短检查间隔（秒）
+        'max_interval': 1800,    # 最长检查间隔（秒），空闲钱包按此间隔检查
+        'lead_time': 60,         # 预测到达阈值前提前检查的时间（秒）
+        'burn_alpha': 0.5        # 能量消耗速度的指数平滑系数
+    },
+    # 收款钱包列表缓存（秒），后台修改机器人/收款钱包后最多延迟 ttl 秒生效
+    'wallet_cache': {
+        'ttl': 60
+    },
+    # 套餐价格索引：每隔 refresh_interval 秒检查套餐表是否变化
+    'package_index': {
+        'refresh_interval': 60
+    },
+    # 平台路由：缓存平台表，按轮询分组过滤，按近期成功率/延迟选择平台
+    'platform_route': {
+        'refresh_interval': 60,  # 重新加载平台表的间隔（秒），余额以数据库为准
+        'stats_alpha': 0.2       # 成功率/延迟的指数平滑系数
+    },
+    # 平台熔断：接口连续失败后暂停调用，冷却后放行探测请求
+    'circuit_breaker': {
+        'failure_threshold': 3,   # 连续失败多少次后熔断
+        'recovery_timeout': 60,   # 熔断持续时间（秒）
+        'half_open_probes': 1     # 半开状态放行的探测请求数
+    },
+    # 对冲下单（默认关闭）：当前平台超出延迟预算（成功耗时P95）未返回时并行请求下一个平台，先成功者胜出
+    'hedged_order': {
+        'enabled': os.getenv('HEDGED_ORDER_ENABLED', 'false').lower() == 'true',
+        'max_hedges': 1,         # 每笔订单最多额外并行请求的平台数
+        'default_budget': 3,     # 样本不足时的延迟预算（秒）
+        'min_budget': 1,         # 延迟预算下限（秒）
+        'max_budget': 8,         # 延迟预算上限（秒）
+        'min_samples': 10,       # 计算P95所需的最少样本数
+        'sample_size': 100,      # 每个平台保留的耗时样本数
+        'workers': 10            # 对冲下单线程数
+    },
+    # 交易认领：处理前原子认领（状态2-处理中 + 租约），多实例/多线程并行处理时避免重复下单
+    'order_claim': {
+        'lease_seconds': 300,  # 租约时长（秒），须大于单笔交易的最长处理时间，下单前逐笔续约
+        'batch_size': 20,      # 每次认领的交易数，须在租约内处理完 (按单笔最长约10秒估算)
+        'max_batches': 25      # 每个币种每轮最多认领的批次数，剩余交易下轮继续
+    },
+    # 事件管道：入账后立即下单并通知，分钟轮询作为补偿
+    'pipeline': {
+        'enabled': os.getenv('ORDER_PIPELINE_ENABLED', 'true').lower() == 'true',
+        'order_workers': 4,   # 下单线程数
+        'notify_workers': 2   # 通知线程数
+    },
+    # Telegram发件箱：按机器人/会话限速发送，429时按 retry_after 延后重试
+    'tg_outbox': {
+        'poll_interval': 1,    # 检查待发送消息的间隔（秒）
+        'batch_size': 100,     # 每次认领的待发送消息数
+        'lease_seconds': 120,  # 认领租约（秒），实例异常退出后到期的消息由其他实例重新认领
+        'concurrency': 20,     # 同时发送的消息数
+        'bot_rate': 30,        # 每个机器人每秒最多发送数
+        'chat_rate': 1,        # 每个会话每秒最多发送数
+        'max_chat_wait': 10,   # 单个会话排队超过该时长（秒）的消息放回发件箱稍后认领，须小于认领租约
+        'max_attempts': 5,     # 最多尝试次数
+        'retry_delay': 5       # 网络异常/5xx 的基础重试间隔（秒），按尝试次数指数增长
+    },
+    # 智能托管预测补能：预测能量将在 lead_time 内低于阈值时提前下单
+    'ai_refill': {
+        'enabled': os.getenv('AI_REFILL_ENABLED', 'true').lower() == 'true',
+        'lead_time': int(os.getenv('AI_REFILL_LEAD_TIME', 600)),  # 提前下单时间（秒）
+        'history_window': 86400  # 无资源快照时，按该时间窗口内的AI下单量估算消耗速度（秒）
     }
 }
 
-# 平台配置示例
+# 平台配置示例 (每个平台对应 services/energy_platform_adapters.py 中的一个适配器)
 PLATFORM_CONFIG = {
     'nee_cc': {
         'name': 'nee.cc',
         'platform_id': 1,
-        'api_url': 'https://api.tronqq.com/openapi/v2/order/submit'
+        'api_url': 'https://api.tronqq.com/openapi/v2/order/submit',
+        'timeout': 10  # 下单超时（秒）
     },
     'rent_energy': {
         'name': 'RentEnergysBot',
         'platform_id': 2,
-        'api_url': 'https://api.wallet.buzz'
+        'api_url': 'https://api.wallet.buzz',
+        'timeout': 10  # 下单超时（秒）
     },
     'self_stake': {
         'name': '自己质押',
         'platform_id': 3,
-        'api_url': 'energy_stake_api_url'
+        'api_url': 'energy_stake_api_url',
+        'timeout': 15  # 下单超时（秒）
     },
     'trongas': {
         'name': 'trongas.io',
         'platform_id': 4,
-        'api_url': 'https://trongas.io/api/pay'
+        'api_url': 'https://trongas.io/api/pay',
+        'timeout': 10  # 下单超时（秒）
     }
 }
 
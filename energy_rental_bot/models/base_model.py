@@ -2,7 +2,7 @@
 能量租赁机器人基础模型类
 """
 
-from energy_rental_bot.utils.energy_utils import DatabaseConnection, EnergyUtils
+from energy_rental_bot.utils.energy_utils import DatabaseConnection, AsyncDatabaseConnection, EnergyUtils
 
 
 class BaseModel:
@@ -33,7 +33,91 @@ class BaseModel:
         sql = f"INSERT INTO {self.table} ({columns}) VALUES ({placeholders})"
         return self.db.execute(sql, values)
 
+    def insert_many(self, rows, skip_duplicate_column=None):
+        """批量插入记录 (一次往返写入多行，返回影响行数，写入失败返回None；指定 skip_duplicate_column 时只跳过唯一键冲突的行，其他数据错误仍然报错)"""
+        if not rows:
+            return 0
+
+        keys = list(rows[0].keys())
+        columns = ", ".join(keys)
+        placeholders = ", ".join(["%s"] * len(keys))
+        values = [[row.get(k) for k in keys] for row in rows]
+        sql = f"INSERT INTO {self.table} ({columns}) VALUES ({placeholders})"
+        if skip_duplicate_column:
+            sql += f" ON DUPLICATE KEY UPDATE {skip_duplicate_column} = {skip_duplicate_column}"
+        return self.db.execute_many(sql, values)
+
+    def update_many(self, rows):
+        """批量更新记录 (每行须包含rid，合并为一条 UPDATE ... CASE 语句，返回影响行数)"""
+        if not rows:
+            return 0
+
+        columns = []
+        for row in rows:
+            for k in row.keys():
+                if k != 'rid' and k not in columns:
+                    columns.append(k)
+
+        # 每列按rid取值，未提供该列的行保持原值
+        set_clauses = []
+        values = []
+        for column in columns:
+            cases = []
+            for row in rows:
+                if column in row:
+                    cases.append("WHEN %s THEN %s")
+                    values.extend([row['rid'], row[column]])
+            set_clauses.append(f"{column} = CASE rid {' '.join(cases)} ELSE {column} END")
+
+        rids = [row['rid'] for row in rows]
+        values.extend(rids)
+        placeholders = ", ".join(["%s"] * len(rids))
+        sql = f"UPDATE {self.table} SET {', '.join(set_clauses)} WHERE rid IN ({placeholders})"
+        return self.db.execute(sql, values)
+
     def delete(self, rid):
         """删除记录"""
         sql = f"DELETE FROM {self.table} WHERE rid = %s"
         return self.db.execute(sql, [rid])
+
+
+class AsyncBaseModel:
+    """异步基础模型类"""
+
+    def __init__(self, table_name):
+        self.table = table_name
+        self.db = AsyncDatabaseConnection()
+
+    async def query(self, sql, params=None):
+        """执行查询"""
+        return await self.db.query(sql, params)
+
+    async def execute(self, sql, params=None):
+        """执行更新/插入"""
+        return await self.db.execute(sql, params)
+
+    async def get_by_id(self, rid):
+        """根据ID获取记录"""
+        sql = f"SELECT * FROM {self.table} WHERE rid = %s"
+        result = await self.db.query(sql, [rid])
+        return result[0] if result else None
+
+    async def update(self, rid, data):
+        """更新记录"""
+        set_clause = ", ".join([f"{k} = %s" for k in data.keys()])
+        values = list(data.values()) + [rid]
+        sql = f"UPDATE {self.table} SET {set_clause} WHERE rid = %s"
+        return await self.db.execute(sql, values)
+
+    async def insert(self, data):
+        """插入记录"""
+        columns = ", ".join(data.keys())
+        placeholders = ", ".join(["%s"] * len(data))
+        values = list(data.values())
+        sql = f"INSERT INTO {self.table} ({columns}) VALUES ({placeholders})"
+        return await self.db.execute(sql, values)
+
+    async def delete(self, rid):
+        """删除记录"""
+        sql = f"DELETE FROM {self.table} WHERE rid = %s"
+        return await self.db.execute(sql, [rid])
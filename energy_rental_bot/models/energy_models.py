@@ -2,7 +2,9 @@
 能量租赁机器人模型类
 """
 
-from .base_model import BaseModel
+import json
+from datetime import datetime, timedelta
+from .base_model import BaseModel, AsyncBaseModel
 from energy_rental_bot.utils.energy_utils import EnergyUtils
 
 
@@ -86,33 +88,18 @@ class EnergyAiBishuModel(BaseModel):
             'bishu_daili_type': 'energy'
         }]
 
+    def claim_buy(self, rid):
+        """原子认领待购买的钱包 (is_buy 由 Y 改为 B-下单中)，已被其他线程/实例认领时返回 False"""
+        sql = "UPDATE energy_ai_bishu SET is_buy = 'B' WHERE rid = %s AND is_buy = 'Y'"
+        return bool(self.db.execute(sql, [rid]))
+
     def get_for_notification(self):
-        """获取需要通知的笔数套餐记录"""
+        """获取需要通知的笔数套餐记录 (不返回模拟数据，避免向发件箱写入无效消息)"""
         sql = """
         SELECT * FROM energy_ai_bishu
         WHERE is_notice = 'Y'
         """
-        result = self.db.query(sql)
-        if result:
-            return result
-
-        # 模拟数据
-        return [{
-            'rid': 1,
-            'tg_uid': 1234567890,  # 使用有效的Telegram chat_id (数字)，测试用
-            'wallet_addr': 'TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t',
-            'per_bishu_energy_quantity': 50000,
-            'bot_token': 'bot_token_here',
-            'is_notice': 'Y',
-            'is_notice_admin': 'N',
-            'tg_admin_uid': 'admin123',
-            'comments': '',
-            'tg_notice_obj_send': 'group1,group2',
-            'bot_username': 'energybot',
-            'bot_admin_username': '@admin',
-            'max_buy_quantity': 100,
-            'total_buy_quantity': 10
-        }]
+        return self.db.query(sql) or []
 
 
 class EnergyAiTrusteeshipModel(BaseModel):
@@ -201,6 +188,11 @@ class EnergyAiTrusteeshipModel(BaseModel):
             'is_open_ai_trusteeship': 'Y'
         }]
 
+    def claim_buy(self, rid):
+        """原子认领待购买的钱包 (is_buy 由 Y 改为 B-下单中)，已被其他线程/实例认领时返回 False"""
+        sql = "UPDATE energy_ai_trusteeship SET is_buy = 'B' WHERE rid = %s AND is_buy = 'Y'"
+        return bool(self.db.execute(sql, [rid]))
+
     def update_resource(self, rid, data):
         """更新资源状态"""
         return self.update(rid, data)
@@ -232,12 +224,43 @@ class EnergyAiTrusteeshipModel(BaseModel):
         }]
 
 
+class AsyncEnergyAiBishuModel(AsyncBaseModel):
+    """能量AI笔数异步模型 (供Telegram处理器使用)"""
+
+    def __init__(self):
+        super().__init__('energy_ai_bishu')
+
+    async def get_by_wallet_addr(self, wallet_addr):
+        """根据钱包地址获取笔数套餐信息"""
+        sql = "SELECT * FROM energy_ai_bishu WHERE wallet_addr = %s"
+        result = await self.db.query(sql, [wallet_addr])
+        return result[0] if result else None
+
+
+class AsyncEnergyAiTrusteeshipModel(AsyncBaseModel):
+    """能量AI托管异步模型 (供Telegram处理器使用)"""
+
+    def __init__(self):
+        super().__init__('energy_ai_trusteeship')
+
+    async def get_by_wallet_addr(self, wallet_addr):
+        """根据钱包地址获取托管信息"""
+        sql = "SELECT * FROM energy_ai_trusteeship WHERE wallet_addr = %s"
+        result = await self.db.query(sql, [wallet_addr])
+        return result[0] if result else None
+
+
 class EnergyPlatformModel(BaseModel):
     """能量平台模型"""
 
     def __init__(self):
         super().__init__('energy_platform')
 
+    def get_active_list(self):
+        """获取全部启用的平台"""
+        sql = "SELECT * FROM energy_platform WHERE status = 0 ORDER BY seq_sn ASC"
+        return self.db.query(sql) or []
+
     def get_available_platforms(self, energy_amount, poll_group):
         """获取可用平台列表"""
         sql = """
@@ -289,6 +312,22 @@ class EnergyPlatformOrderModel(BaseModel):
     def __init__(self):
         super().__init__('energy_platform_order')
 
+    def get_ai_energy_usage(self, addresses, window_seconds):
+        """统计钱包近期AI自动下单的能量总量 (按接收地址分组)"""
+        if not addresses:
+            return {}
+
+        since = (datetime.now() - timedelta(seconds=window_seconds)).strftime('%Y-%m-%d %H:%M:%S')
+        placeholders = ", ".join(["%s"] * len(addresses))
+        sql = f"""
+        SELECT receive_address, SUM(energy_amount) AS total_energy
+        FROM energy_platform_order
+        WHERE receive_address IN ({placeholders}) AND source_type = 3 AND energy_time >= %s
+        GROUP BY receive_address
+        """
+        result = self.db.query(sql, list(addresses) + [since])
+        return {row['receive_address']: int(row['total_energy'] or 0) for row in result}
+
 
 class EnergyPlatformPackageModel(BaseModel):
     """能量平台套餐模型"""
@@ -296,6 +335,17 @@ class EnergyPlatformPackageModel(BaseModel):
     def __init__(self):
         super().__init__('energy_platform_package')
 
+    def get_active_list(self):
+        """获取全部启用的套餐"""
+        sql = "SELECT * FROM energy_platform_package WHERE status = 0 ORDER BY rid"
+        return self.db.query(sql) or []
+
+    def get_version(self):
+        """获取套餐表版本标识 (行数 + 最后更新时间)，用于判断套餐是否变化"""
+        sql = "SELECT COUNT(*) AS total, MAX(update_time) AS last_update FROM energy_platform_package"
+        result = self.db.query(sql)
+        return (result[0]['total'], str(result[0]['last_update'])) if result else None
+
     def get_by_trx_price(self, bot_rid, trx_price):
         """根据TRX价格获取套餐"""
         sql = """
@@ -355,7 +405,7 @@ class EnergyWalletTradeListModel(BaseModel):
         }]
 
     def get_tg_notifications(self, notify_type):
-        """获取需要发送TG通知的记录"""
+        """获取需要发送TG通知的记录 (不返回模拟数据，避免向发件箱写入无效消息)"""
         status_map = {
             'self_order': "process_status = 9 AND tg_notice_status_receive = 'N'",
             'trusteeship': "process_status = 9 AND tg_notice_status_send = 'N'"
@@ -363,31 +413,108 @@ class EnergyWalletTradeListModel(BaseModel):
 
         condition = status_map.get(notify_type, "process_status = 9")
         sql = f"SELECT * FROM energy_wallet_trade_list WHERE {condition}"
-        result = self.db.query(sql)
-        if result:
-            return result
+        return self.db.query(sql) or []
 
-        # 模拟数据
-        return [{
-            'rid': 1,
-            'tx_hash': 'hash123',
-            'transferfrom_address': 'TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t',
-            'coin_name': 'trx',
-            'amount': 10.5,
-            'process_status': 9,
-            'tg_notice_status_receive': 'N',
-            'tg_notice_status_send': 'N',
-            'tg_notice_obj_receive': 'group1,group2',
-            'tg_notice_obj_send': 'group1,group2',
-            'bot_token': 'bot_token_here',
-            'receive_wallet': 'TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t',
-            'energy_amount': 50000,
-            'package_name': '50000能量1天',
-            'bot_username': 'energybot',
-            'bot_admin_username': '@admin',
-            'energy_platform_bot_rid': 1,
-            'tg_uid': 1234567890  # 添加缺失的tg_uid字段，使用有效的Telegram chat_id (数字)
-        }]
+    def claim_pending_transactions(self, coin_name, wallet_addrs, worker_id, lease_seconds, limit, after_rid=0):
+        """原子认领多个收款钱包 rid 大于 after_rid 的待处理交易 (状态改为2-处理中并写入认领标识与租约)，返回认领到的交易"""
+        if not wallet_addrs:
+            return []
+
+        placeholders = ", ".join(["%s"] * len(wallet_addrs))
+        sql = f"""
+        UPDATE energy_wallet_trade_list
+        SET process_status = 2, worker_id = %s, lease_expire_time = DATE_ADD(NOW(), INTERVAL %s SECOND)
+        WHERE process_status = 1 AND coin_name = %s AND transferto_address IN ({placeholders}) AND rid > %s
+        ORDER BY rid
+        LIMIT %s
+        """
+        if not self.db.execute(sql, [worker_id, lease_seconds, coin_name] + list(wallet_addrs) + [after_rid, limit]):
+            return []
+
+        sql = "SELECT * FROM energy_wallet_trade_list WHERE process_status = 2 AND worker_id = %s ORDER BY rid"
+        return self.db.query(sql, [worker_id]) or []
+
+    def claim_transaction(self, rid, worker_id, lease_seconds):
+        """原子认领单笔待处理交易，认领成功返回 True"""
+        sql = """
+        UPDATE energy_wallet_trade_list
+        SET process_status = 2, worker_id = %s, lease_expire_time = DATE_ADD(NOW(), INTERVAL %s SECOND)
+        WHERE rid = %s AND process_status = 1
+        """
+        return bool(self.db.execute(sql, [worker_id, lease_seconds, rid]))
+
+    def renew_lease(self, rid, worker_id, lease_seconds):
+        """续约仍由本认领标识持有的交易，租约已过期被回收/被其他实例认领时返回 False"""
+        sql = """
+        UPDATE energy_wallet_trade_list
+        SET lease_expire_time = DATE_ADD(NOW(), INTERVAL %s SECOND)
+        WHERE rid = %s AND worker_id = %s AND process_status = 2
+        """
+        return bool(self.db.execute(sql, [lease_seconds, rid, worker_id]))
+
+    def finish_transaction(self, rid, worker_id, data):
+        """写入最终处理结果 (仅当交易仍由本认领标识持有)，写入成功返回 True"""
+        set_clause = ", ".join([f"{k} = %s" for k in data.keys()])
+        sql = f"""
+        UPDATE energy_wallet_trade_list
+        SET {set_clause}, lease_expire_time = NULL
+        WHERE rid = %s AND worker_id = %s AND process_status = 2
+        """
+        return bool(self.db.execute(sql, list(data.values()) + [rid, worker_id]))
+
+    def release_transaction(self, rid, worker_id):
+        """释放未完成处理的交易 (恢复为待处理，已更新为最终状态的交易不受影响)"""
+        sql = """
+        UPDATE energy_wallet_trade_list
+        SET process_status = 1, worker_id = NULL, lease_expire_time = NULL
+        WHERE rid = %s AND process_status = 2 AND worker_id = %s
+        """
+        return self.db.execute(sql, [rid, worker_id])
+
+    def recover_expired_leases(self):
+        """回收租约已过期的处理中交易 (认领后进程异常退出)，返回回收行数"""
+        sql = """
+        UPDATE energy_wallet_trade_list
+        SET process_status = 1, worker_id = NULL, lease_expire_time = NULL
+        WHERE process_status = 2 AND lease_expire_time < NOW()
+        """
+        return self.db.execute(sql)
+
+    def get_pending_by_tx_hash(self, hash_list):
+        """根据hash获取待处理的交易"""
+        if not hash_list:
+            return []
+
+        placeholders = ", ".join(["%s"] * len(hash_list))
+        sql = f"SELECT * FROM energy_wallet_trade_list WHERE tx_hash IN ({placeholders}) AND process_status = 1"
+        return self.db.query(sql, list(hash_list)) or []
+
+    def claim_tg_notification(self, rid):
+        """原子认领下单成功通知 (标记已通知)，已被其他线程/实例认领时返回 False"""
+        sql = """
+        UPDATE energy_wallet_trade_list
+        SET tg_notice_status_receive = 'Y'
+        WHERE rid = %s AND process_status = 9 AND tg_notice_status_receive = 'N'
+        """
+        return bool(self.db.execute(sql, [rid]))
+
+    def release_tg_notification(self, rid):
+        """通知写入失败时撤销认领，下轮重试"""
+        sql = "UPDATE energy_wallet_trade_list SET tg_notice_status_receive = 'N' WHERE rid = %s"
+        return self.db.execute(sql, [rid])
+
+    def get_tg_notification_by_rid(self, rid):
+        """获取单笔待发送下单成功通知的记录"""
+        sql = """
+        SELECT * FROM energy_wallet_trade_list
+        WHERE rid = %s AND process_status = 9 AND tg_notice_status_receive = 'N'
+        """
+        result = self.db.query(sql, [rid])
+        return result[0] if result else None
+
+    def ingest_transactions(self, records):
+        """幂等写入交易 (依赖 uk_tx_hash 唯一键，已存在的交易直接跳过，返回新增行数，写入失败返回None)"""
+        return self.insert_many(records, skip_duplicate_column='tx_hash')
 
     def get_by_tx_hash(self, hash_list):
         """检查hash是否存在"""
@@ -398,3 +525,126 @@ class EnergyWalletTradeListModel(BaseModel):
         sql = f"SELECT tx_hash FROM energy_wallet_trade_list WHERE tx_hash IN ({placeholders})"
         result = self.db.query(sql, hash_list)
         return [row['tx_hash'] for row in result] if result else []
+
+
+class EnergyWalletTradeCursorModel(BaseModel):
+    """能量钱包交易拉取游标模型 (每个收款钱包+币种一条)"""
+
+    def __init__(self):
+        super().__init__('energy_wallet_trade_cursor')
+
+    def get_last_timestamp(self, receive_wallet, coin_name):
+        """获取已拉取到的最新交易时间戳"""
+        sql = """
+        SELECT last_block_timestamp FROM energy_wallet_trade_cursor
+        WHERE receive_wallet = %s AND coin_name = %s
+        """
+        result = self.db.query(sql, [receive_wallet, coin_name])
+        return result[0]['last_block_timestamp'] if result else None
+
+    def advance(self, receive_wallet, coin_name, block_timestamp):
+        """推进游标 (只前进不后退)"""
+        sql = """
+        INSERT INTO energy_wallet_trade_cursor (receive_wallet, coin_name, last_block_timestamp)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE last_block_timestamp = GREATEST(last_block_timestamp, VALUES(last_block_timestamp))
+        """
+        return self.db.execute(sql, [receive_wallet, coin_name, block_timestamp])
+
+    def get_last_block_number(self, receive_wallet, coin_name):
+        """获取已扫描到的最新区块号"""
+        sql = """
+        SELECT last_block_number FROM energy_wallet_trade_cursor
+        WHERE receive_wallet = %s AND coin_name = %s
+        """
+        result = self.db.query(sql, [receive_wallet, coin_name])
+        return result[0]['last_block_number'] if result else None
+
+    def advance_block_number(self, receive_wallet, coin_name, block_number, block_timestamp=0):
+        """推进区块游标 (只前进不后退)"""
+        sql = """
+        INSERT INTO energy_wallet_trade_cursor (receive_wallet, coin_name, last_block_number, last_block_timestamp)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            last_block_number = GREATEST(last_block_number, VALUES(last_block_number)),
+            last_block_timestamp = GREATEST(last_block_timestamp, VALUES(last_block_timestamp))
+        """
+        return self.db.execute(sql, [receive_wallet, coin_name, block_number, block_timestamp])
+
+
+class EnergyTgOutboxModel(BaseModel):
+    """Telegram消息发件箱模型"""
+
+    def __init__(self):
+        super().__init__('energy_tg_outbox')
+
+    def enqueue(self, bot_token, chat_id, message, keyboard=None):
+        """写入待发送消息"""
+        return self.insert({
+            'bot_token': bot_token,
+            'chat_id': str(chat_id),
+            'message': message,
+            'reply_markup': json.dumps(keyboard) if keyboard else None
+        })
+
+
+class AsyncEnergyTgOutboxModel(AsyncBaseModel):
+    """Telegram消息发件箱异步模型 (供发送器使用，发送前原子认领，多实例不重复发送)"""
+
+    def __init__(self):
+        super().__init__('energy_tg_outbox')
+
+    async def claim_due(self, worker_id, lease_seconds, limit):
+        """原子认领到期待发送的消息 (状态改为3-发送中并写入认领标识与租约，租约过期的发送中消息可被重新认领)"""
+        sql = """
+        UPDATE energy_tg_outbox
+        SET status = 3, worker_id = %s, lease_expire_time = DATE_ADD(NOW(), INTERVAL %s SECOND)
+        WHERE (status = 0 AND next_attempt_time <= NOW()) OR (status = 3 AND lease_expire_time < NOW())
+        ORDER BY rid
+        LIMIT %s
+        """
+        if not await self.db.execute(sql, [worker_id, lease_seconds, limit]):
+            return []
+
+        sql = "SELECT * FROM energy_tg_outbox WHERE status = 3 AND worker_id = %s ORDER BY rid"
+        return await self.db.query(sql, [worker_id]) or []
+
+    async def mark_sent(self, rid, worker_id):
+        """标记已发送"""
+        sql = """
+        UPDATE energy_tg_outbox
+        SET status = 1, attempts = attempts + 1, sent_time = NOW(), lease_expire_time = NULL
+        WHERE rid = %s AND worker_id = %s AND status = 3
+        """
+        return await self.db.execute(sql, [rid, worker_id])
+
+    async def mark_retry(self, rid, worker_id, delay, error, max_attempts=None):
+        """标记发送失败，delay 秒后重试 (达到最大次数时标记为发送失败，max_attempts 为空时不限次数)"""
+        sql = """
+        UPDATE energy_tg_outbox
+        SET attempts = attempts + 1,
+            status = IF(%s IS NOT NULL AND attempts >= %s, 2, 0),
+            next_attempt_time = DATE_ADD(NOW(), INTERVAL %s SECOND),
+            last_error = %s,
+            lease_expire_time = NULL
+        WHERE rid = %s AND worker_id = %s AND status = 3
+        """
+        return await self.db.execute(sql, [max_attempts, max_attempts, int(delay), str(error)[:500], rid, worker_id])
+
+    async def defer(self, rid, worker_id, delay):
+        """放回待发送，delay 秒后再认领 (会话积压时使用，不计入尝试次数)"""
+        sql = """
+        UPDATE energy_tg_outbox
+        SET status = 0, next_attempt_time = DATE_ADD(NOW(), INTERVAL %s SECOND), lease_expire_time = NULL
+        WHERE rid = %s AND worker_id = %s AND status = 3
+        """
+        return await self.db.execute(sql, [int(delay), rid, worker_id])
+
+    async def mark_failed(self, rid, worker_id, error):
+        """标记发送失败 (不再重试)"""
+        sql = """
+        UPDATE energy_tg_outbox
+        SET status = 2, attempts = attempts + 1, last_error = %s, lease_expire_time = NULL
+        WHERE rid = %s AND worker_id = %s AND status = 3
+        """
+        return await self.db.execute(sql, [str(error)[:500], rid, worker_id])
@@ -0,0 +1,238 @@
+"""
+能量平台适配器
+"""
+
+import abc
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from energy_rental_bot.config.config import PLATFORM_CONFIG
+from energy_rental_bot.utils.energy_utils import EnergyUtils
+
+
+class EnergyPlatformAdapter(abc.ABC):
+    """能量平台适配器基类 - 每个平台一个子类，统一超时与耗时统计"""
+
+    # PLATFORM_CONFIG 中的平台键
+    key = ''
+
+    def __init__(self):
+        config = PLATFORM_CONFIG[self.key]
+        self.name = config['name']
+        self.platform_id = config['platform_id']
+        self.api_url = config['api_url']
+        self.timeout = config.get('timeout', 10)
+        self.metrics = {
+            'requests': 0,
+            'success': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'avg_latency': 0.0
+        }
+        self.lock = threading.Lock()
+
+    async def place_order(self, platform, address, energy_amount, energy_day):
+        """下单 (超时由HTTP请求自身的平台超时时间控制，请求结束后才返回，不会在切换平台后迟到成功)"""
+        started = time.monotonic()
+        result = await self.request_order(platform, address, energy_amount, energy_day)
+        latency = time.monotonic() - started
+
+        timed_out = not result['success'] and latency >= self.timeout
+        self.record(result['success'], timed_out, latency)
+        return result
+
+    async def place_orders(self, orders):
+        """批量下单，orders 为 (platform, address, energy_amount, energy_day) 列表 (平台无批量接口时并发逐笔下单)"""
+        return await asyncio.gather(*(self.place_order(*order) for order in orders))
+
+    @abc.abstractmethod
+    async def request_order(self, platform, address, energy_amount, energy_day):
+        """调用平台下单接口"""
+
+    async def request(self, url, data=None, headers=None):
+        """发送请求 (使用平台超时时间)"""
+        return await EnergyUtils.send_http_request_async(url, data, headers, timeout=self.timeout)
+
+    def record(self, success, timed_out, latency):
+        """记录耗时统计"""
+        with self.lock:
+            self.metrics['requests'] += 1
+            self.metrics['success' if success else 'failures'] += 1
+            if timed_out:
+                self.metrics['timeouts'] += 1
+            self.metrics['avg_latency'] += (latency - self.metrics['avg_latency']) / self.metrics['requests']
+
+    def get_metrics(self):
+        """获取耗时统计"""
+        with self.lock:
+            return dict(self.metrics, avg_latency_ms=int(self.metrics['avg_latency'] * 1000))
+
+    @staticmethod
+    def parse_response(response, is_success, build_result, fail_message='下单失败'):
+        """解析平台响应 (请求失败/响应无法解析时带 transport_error 标记，供熔断器区分接口故障与业务失败)"""
+        if not response:
+            return {'success': False, 'message': 'API请求失败', 'transport_error': True}
+
+        try:
+            result = json.loads(response)
+        except json.JSONDecodeError:
+            return {'success': False, 'message': 'API响应解析失败', 'transport_error': True}
+
+        if is_success(result):
+            return dict(build_result(result), success=True)
+        return {'success': False, 'message': fail_message(result) if callable(fail_message) else fail_message}
+
+
+class EnergyPlatformAdapterRegistry:
+    """能量平台适配器注册表 - 按 platform_name（平台ID）分发下单，两个下单任务共用"""
+
+    adapters = {}
+
+    @classmethod
+    def register(cls, adapter_class):
+        """注册适配器 (类装饰器)"""
+        adapter = adapter_class()
+        cls.adapters[adapter.platform_id] = adapter
+        return adapter_class
+
+    @classmethod
+    def get(cls, platform_name):
+        """获取适配器"""
+        try:
+            return cls.adapters.get(int(platform_name))
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    async def place_order_async(cls, platform, address, energy_amount, energy_day):
+        """调用相应平台下单"""
+        adapter = cls.get(platform['platform_name'])
+        if adapter is None:
+            return {'success': False, 'message': '不支持的平台类型'}
+        return await adapter.place_order(platform, address, energy_amount, energy_day)
+
+    @classmethod
+    def place_order(cls, platform, address, energy_amount, energy_day):
+        """调用相应平台下单 (同步版本，供任务线程调用)"""
+        return asyncio.run(cls.place_order_async(platform, address, energy_amount, energy_day))
+
+    @classmethod
+    def get_metrics(cls):
+        """获取全部平台的耗时统计"""
+        return {adapter.name: adapter.get_metrics() for adapter in cls.adapters.values()}
+
+
+@EnergyPlatformAdapterRegistry.register
+class NeeCcAdapter(EnergyPlatformAdapter):
+    """nee.cc平台"""
+
+    key = 'nee_cc'
+
+    async def request_order(self, platform, address, energy_amount, energy_day):
+        """调用nee.cc API"""
+        param = {
+            "uid": platform['platform_uid'],
+            "resource_type": "0",
+            "receive_address": address,
+            "amount": str(energy_amount),
+            "freeze_day": str(energy_day),
+            "time": str(int(time.time()))
+        }
+
+        # 添加签名
+        sorted_param = sorted(param.items())
+        sign_str = ''.join([f"{k}{v}" for k, v in sorted_param if k not in ["sign", "sign_type"] and v != ''])
+        param['sign'] = hashlib.md5(sign_str.encode()).hexdigest()
+
+        response = await self.request(self.api_url, json.dumps(param), {'Content-Type': 'application/json'})
+
+        return self.parse_response(
+            response,
+            lambda result: result.get('status') == 200,
+            lambda result: {'order_no': result['data']['order_no']},
+            lambda result: result.get('msg', '下单失败')
+        )
+
+
+@EnergyPlatformAdapterRegistry.register
+class RentEnergyAdapter(EnergyPlatformAdapter):
+    """RentEnergysBot平台"""
+
+    key = 'rent_energy'
+
+    async def request_order(self, platform, address, energy_amount, energy_day):
+        """调用RentEnergysBot API"""
+        energy_type = 'day' if energy_day == 1 else ('3day' if energy_day == 3 else 'hour')
+        energy_amount = max(energy_amount, 33000)
+
+        url = (
+            f"{self.api_url}?api=getEnergy&apikey={platform['platform_apikey']}"
+            f"&address={address}&amount={energy_amount}&type={energy_type}"
+        )
+
+        response = await self.request(url)
+
+        return self.parse_response(
+            response,
+            lambda result: result.get('status') == 'success',
+            lambda result: {'txid': result['txid']}
+        )
+
+
+@EnergyPlatformAdapterRegistry.register
+class SelfStakeAdapter(EnergyPlatformAdapter):
+    """自己质押平台"""
+
+    key = 'self_stake'
+
+    async def request_order(self, platform, address, energy_amount, energy_day):
+        """自己质押代理"""
+        params = {
+            'pri': platform['platform_apikey'],
+            'fromaddress': platform['platform_uid'],
+            'receiveaddress': address,
+            'resourcename': 'ENERGY',
+            'resourceamount': energy_amount,
+            'resourcetype': 1,
+            'permissionid': platform['permission_id']
+        }
+
+        response = await self.request(self.api_url, params)
+
+        return self.parse_response(
+            response,
+            lambda result: result.get('code') == 200,
+            lambda result: {'txid': result['data']['txid'], 'use_trx': result['data']['use_trx']},
+            '质押失败'
+        )
+
+
+@EnergyPlatformAdapterRegistry.register
+class TrongasAdapter(EnergyPlatformAdapter):
+    """trongas.io平台"""
+
+    key = 'trongas'
+
+    async def request_order(self, platform, address, energy_amount, energy_day):
+        """调用trongas.io API"""
+        rent_time = energy_day if energy_day == 1 else (72 if energy_day == 3 else 1)
+
+        param = {
+            "username": platform['platform_uid'],
+            "password": platform['platform_apikey'],
+            "resType": "ENERGY",
+            "payNums": energy_amount,
+            "rentTime": rent_time,
+            "resLock": 0,
+            "receiveAddress": address
+        }
+
+        response = await self.request(self.api_url, param)
+
+        return self.parse_response(
+            response,
+            lambda result: result.get('code') == 10000,
+            lambda result: {'order_id': result['data']['orderId'], 'order_money': result['data']['orderMoney']}
+        )
@@ -0,0 +1,242 @@
+"""
+能量平台路由服务
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from energy_rental_bot.models.energy_models import EnergyPlatformModel
+from energy_rental_bot.config.config import TASK_CONFIG
+from energy_rental_bot.utils.energy_utils import EnergyUtils, CircuitBreakerRegistry
+
+
+class EnergyPlatformRouter:
+    """能量平台路由 - 缓存平台表，内存中扣减余额，按轮询分组过滤并按成功率/延迟排序"""
+
+    platforms = []
+    balances = {}
+    stats = {}
+    loaded_at = 0
+    lock = threading.Lock()
+    executor = None
+
+    @classmethod
+    def refresh(cls, force=False):
+        """按间隔重新加载平台表 (数据库余额为准)"""
+        config = TASK_CONFIG['platform_route']
+        if not force and time.time() - cls.loaded_at < config['refresh_interval']:
+            return
+
+        with cls.lock:
+            if not force and time.time() - cls.loaded_at < config['refresh_interval']:
+                return
+
+            platforms = EnergyPlatformModel().get_active_list()
+            cls.platforms = platforms
+            cls.balances = {platform['rid']: float(platform.get('platform_balance') or 0) for platform in platforms}
+            cls.loaded_at = time.time()
+
+    @classmethod
+    def invalidate(cls):
+        """平台配置变更后调用，下次选择平台时重新加载"""
+        with cls.lock:
+            cls.loaded_at = 0
+
+    @staticmethod
+    def in_poll_group(platform, poll_group):
+        """平台是否属于轮询分组 (平台未设置分组时服务全部分组)"""
+        platform_groups = [g.strip() for g in str(platform.get('poll_group') or '').split(',') if g.strip()]
+        return not poll_group or not platform_groups or poll_group in platform_groups
+
+    @classmethod
+    def get_stats(cls, rid):
+        """获取平台统计 (未知平台视为成功率100%)"""
+        return cls.stats.get(rid) or {'success_rate': 1.0, 'latency': 0.0, 'orders': 0, 'latencies': []}
+
+    @classmethod
+    def select(cls, energy_amount, poll_group=None):
+        """选择可用平台，按近期成功率、延迟、seq_sn 排序"""
+        cls.refresh()
+
+        # 平台表为空（如开发环境）时回退到数据库查询
+        if not cls.platforms:
+            return EnergyPlatformModel().get_available_platforms(energy_amount, poll_group)
+
+        with cls.lock:
+            candidates = [
+                platform for platform in cls.platforms
+                if cls.balances.get(platform['rid'], 0) >= energy_amount and cls.in_poll_group(platform, poll_group)
+            ]
+
+            def sort_key(platform):
+                stats = cls.get_stats(platform['rid'])
+                # 成功率按10%分档，同档内延迟低的优先
+                return (-round(stats['success_rate'], 1), stats['latency'], platform.get('seq_sn', 0))
+
+            return sorted(candidates, key=sort_key)
+
+    @classmethod
+    def record(cls, rid, success, latency):
+        """记录下单结果"""
+        alpha = TASK_CONFIG['platform_route']['stats_alpha']
+
+        with cls.lock:
+            stats = cls.stats.get(rid)
+            if stats is None:
+                stats = cls.stats[rid] = {
+                    'success_rate': 1.0,
+                    'latency': 0.0,
+                    'orders': 0,
+                    'latencies': deque(maxlen=TASK_CONFIG['hedged_order']['sample_size'])
+                }
+
+            stats['success_rate'] += ((1.0 if success else 0.0) - stats['success_rate']) * alpha
+            stats['latency'] = latency if not stats['orders'] else stats['latency'] + (latency - stats['latency']) * alpha
+            stats['orders'] += 1
+
+            # 成功下单的耗时样本，用于计算对冲延迟预算
+            if success:
+                stats['latencies'].append(latency)
+
+    @classmethod
+    def consume(cls, rid, energy_amount):
+        """下单成功后扣减内存余额"""
+        with cls.lock:
+            if rid in cls.balances:
+                cls.balances[rid] -= energy_amount
+
+    @staticmethod
+    def get_breaker(platform):
+        """获取平台熔断器 (按平台类型共享，两个下单任务共用)"""
+        return CircuitBreakerRegistry.get(f"platform:{platform['platform_name']}")
+
+    @classmethod
+    def call(cls, platform, energy_amount, place_order):
+        """调用平台下单并记录结果 (平台熔断中直接返回失败)"""
+        breaker = cls.get_breaker(platform)
+        if not breaker.allow():
+            return {'success': False, 'message': '平台熔断中'}
+
+        started = time.monotonic()
+        try:
+            result = place_order()
+        except Exception as e:
+            result = {'success': False, 'message': 'API请求失败', 'transport_error': True}
+            EnergyUtils.log('PLATFORM_ROUTE', f"平台 {platform['rid']} 下单异常: {str(e)}")
+        latency = time.monotonic() - started
+
+        # 只有接口故障（请求失败/响应无法解析）触发熔断，业务失败如余额不足不触发
+        if result.get('transport_error'):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        cls.record(platform['rid'], result['success'], latency)
+        if result['success']:
+            cls.consume(platform['rid'], energy_amount)
+        else:
+            EnergyUtils.log('PLATFORM_ROUTE', f"平台 {platform['rid']} 下单失败: {result.get('message', '')}")
+
+        return result
+
+    @classmethod
+    def place(cls, platforms, energy_amount, place_order, on_duplicate=None):
+        """依次尝试平台下单，返回 (成功的平台, 结果)；开启对冲下单时转为对冲模式"""
+        if TASK_CONFIG['hedged_order']['enabled'] and len(platforms) > 1:
+            return cls.place_hedged(platforms, energy_amount, place_order, on_duplicate)
+
+        result = None
+        for platform in platforms:
+            result = cls.call(platform, energy_amount, lambda p=platform: place_order(p))
+            if result['success']:
+                return platform, result
+
+        return None, result
+
+    @classmethod
+    def get_executor(cls):
+        """获取对冲下单线程池"""
+        if cls.executor is None:
+            with cls.lock:
+                if cls.executor is None:
+                    cls.executor = ThreadPoolExecutor(max_workers=TASK_CONFIG['hedged_order']['workers'])
+        return cls.executor
+
+    @classmethod
+    def get_hedge_budget(cls, platform):
+        """对冲延迟预算：平台成功下单耗时的P95 (样本不足时使用默认值)"""
+        config = TASK_CONFIG['hedged_order']
+
+        with cls.lock:
+            latencies = sorted(cls.get_stats(platform['rid'])['latencies'])
+
+        if len(latencies) < config['min_samples']:
+            return config['default_budget']
+
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return min(max(p95, config['min_budget']), config['max_budget'])
+
+    @classmethod
+    def place_hedged(cls, platforms, energy_amount, place_order, on_duplicate=None):
+        """对冲下单：当前平台超出延迟预算仍未返回时并行请求下一个平台，先成功者胜出"""
+        config = TASK_CONFIG['hedged_order']
+        executor = cls.get_executor()
+        remaining = list(platforms)
+        pending = {}
+        hedges = 0
+        result = None
+
+        def launch():
+            platform = remaining.pop(0)
+            future = executor.submit(cls.call, platform, energy_amount, lambda: place_order(platform))
+            pending[future] = platform
+            return platform
+
+        last_platform = launch()
+        while pending:
+            can_hedge = remaining and hedges < config['max_hedges']
+            timeout = cls.get_hedge_budget(last_platform) if can_hedge else None
+            done, _ = futures.wait(list(pending), timeout=timeout, return_when=futures.FIRST_COMPLETED)
+
+            if not done:
+                EnergyUtils.log('HEDGED_ORDER', f"平台 {last_platform['rid']} 超过 {timeout:.1f} 秒未返回，并行请求平台 {remaining[0]['rid']}")
+                last_platform = launch()
+                hedges += 1
+                continue
+
+            winner = None
+            for future in done:
+                platform = pending.pop(future)
+                result = future.result()
+                if not result['success']:
+                    continue
+                if winner is None:
+                    winner = (platform, result)
+                else:
+                    cls.record_duplicate(platform, result, on_duplicate)
+
+            if winner:
+                # 进行中的请求无法撤销，完成后若也成功则记录待对账
+                for future, platform in pending.items():
+                    future.add_done_callback(
+                        lambda f, p=platform: f.result()['success'] and cls.record_duplicate(p, f.result(), on_duplicate)
+                    )
+                return winner
+
+            # 全部失败时继续尝试下一个平台
+            if not pending and remaining:
+                last_platform = launch()
+
+        return None, result
+
+    @staticmethod
+    def record_duplicate(platform, result, on_duplicate):
+        """记录对冲产生的重复订单，供对账处理"""
+        EnergyUtils.log('HEDGED_ORDER', f"平台 {platform['rid']} 对冲请求也已成功，重复订单待对账: {result}")
+        if on_duplicate:
+            try:
+                on_duplicate(platform, result)
+            except Exception as e:
+                EnergyUtils.log('HEDGED_ORDER', f"记录重复订单失败: {str(e)}")
@@ -2,172 +2,477 @@
 能量租赁机器人服务类
 """
 
+import abc
 import json
 import time
+import asyncio
+import threading
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from energy_rental_bot.models.energy_models import (
     EnergyPlatformBotModel,
-    EnergyWalletTradeListModel
+    EnergyPlatformPackageModel,
+    EnergyWalletTradeListModel,
+    EnergyWalletTradeCursorModel
 )
+from energy_rental_bot.config.config import TRON_CONFIG, TASK_CONFIG
+from energy_rental_bot.tasks.energy_order_pipeline import EnergyOrderPipeline
 from energy_rental_bot.utils.energy_utils import EnergyUtils
 
 
 class EnergyWalletServices:
-    """能量钱包服务"""
+    """能量钱包服务 - 收款钱包列表按TTL缓存，各种返回格式由同一份快照生成"""
+
+    snapshots = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def invalidate_cache(cls):
+        """清空钱包缓存 (本进程修改机器人/收款钱包后可调用，其他途径的修改在TTL到期后生效)"""
+        with cls.lock:
+            cls.snapshots = {}
+
+    def get_snapshot(self, status=0):
+        """获取钱包快照 (过期时重新查询并生成全部视图)"""
+        snapshot = self.snapshots.get(status)
+        if snapshot and time.time() - snapshot['loaded_at'] < TASK_CONFIG['wallet_cache']['ttl']:
+            return snapshot
+
+        with self.lock:
+            snapshot = self.snapshots.get(status)
+            if snapshot and time.time() - snapshot['loaded_at'] < TASK_CONFIG['wallet_cache']['ttl']:
+                return snapshot
+
+            model = EnergyPlatformBotModel()
+            result = model.get_list(status)
+            data = {}
+
+            for item in result:
+                if item['status'] == 0 and len(item.get('receive_wallet', '')) == 34:
+                    data[item['rid']] = item
+
+            snapshot = {
+                'loaded_at': time.time(),
+                'list': data,
+                'views': {
+                    # 钱包地址列表
+                    1: {k: v['receive_wallet'] for k, v in data.items()},
+                    # 钱包信息字典
+                    2: {v['receive_wallet']: v for k, v in data.items()},
+                    # 活跃钱包列表
+                    3: [v for k, v in data.items() if v['status'] in [0, 2]],
+                    # 基本信息列表
+                    0: [{'rid': v['rid'], 'receive_wallet': v['receive_wallet']} for k, v in data.items()]
+                }
+            }
+            self.snapshots[status] = snapshot
+            return snapshot
+
+    @staticmethod
+    def copy_view(view):
+        """复制视图及其中的钱包记录，调用方修改返回值不会影响快照"""
+        if isinstance(view, dict):
+            return {k: dict(v) if isinstance(v, dict) else v for k, v in view.items()}
+        return [dict(v) for v in view]
 
     def get_list(self, status=0):
         """获取能量钱包列表"""
-        model = EnergyPlatformBotModel()
-        result = model.get_list(status)
-        data = {}
-
-        for item in result:
-            if item['status'] == 0 and len(item.get('receive_wallet', '')) == 34:
-                data[item['rid']] = item
-
-        return data
+        return self.copy_view(self.get_snapshot(status)['list'])
 
     def get_id_list(self, return_type=0):
         """获取收款钱包ID和名称列表"""
-        data = self.get_list()
-
-        if return_type == 1:
-            # 返回钱包地址列表
-            return {k: v['receive_wallet'] for k, v in data.items()}
-        elif return_type == 2:
-            # 返回钱包信息字典
-            return {v['receive_wallet']: v for k, v in data.items()}
-        elif return_type == 3:
-            # 返回活跃钱包列表
-            return [v for k, v in data.items() if v['status'] in [0, 2]]
-        else:
-            # 返回基本信息列表
-            return [{'rid': v['rid'], 'receive_wallet': v['receive_wallet']} for k, v in data.items()]
+        views = self.get_snapshot()['views']
+        return self.copy_view(views[return_type] if return_type in views else views[0])
+
+
+class EnergyPackagePriceIndex:
+    """能量套餐价格索引 - 按 (bot_rid, 规范化TRX价格) 缓存套餐，套餐表变化时重建"""
+
+    # 与 energy_platform_package.trx_price DECIMAL(20,6) 保持一致
+    PRICE_QUANT = Decimal('0.000001')
+
+    index = {}
+    version = None
+    checked_at = 0
+    lock = threading.Lock()
+
+    @classmethod
+    def normalize_price(cls, trx_price):
+        """规范化价格 (float/Decimal/字符串统一为6位小数的Decimal)，无效值返回None"""
+        try:
+            return Decimal(str(trx_price)).quantize(cls.PRICE_QUANT, rounding=ROUND_HALF_UP)
+        except (InvalidOperation, ValueError, TypeError):
+            return None
+
+    @classmethod
+    def refresh(cls, force=False):
+        """按间隔检查套餐表版本，变化时重建索引"""
+        now = time.time()
+        if not force and now - cls.checked_at < TASK_CONFIG['package_index']['refresh_interval']:
+            return
+
+        with cls.lock:
+            if not force and now - cls.checked_at < TASK_CONFIG['package_index']['refresh_interval']:
+                return
+
+            model = EnergyPlatformPackageModel()
+            version = model.get_version()
+            if force or version is None or version != cls.version:
+                index = {}
+                for package in model.get_active_list():
+                    price = cls.normalize_price(package['trx_price'])
+                    # 同价格多个套餐时取rid最小的，与原SQL查询结果一致
+                    index.setdefault((int(package['bot_rid']), price), package)
+                cls.index = index
+                cls.version = version
+                EnergyUtils.log('PACKAGE_INDEX', f'套餐索引已重建，共 {len(index)} 个套餐')
+
+            cls.checked_at = now
+
+    @classmethod
+    def invalidate(cls):
+        """套餐变更后调用，下次查询时重新检查"""
+        with cls.lock:
+            cls.checked_at = 0
+            cls.version = None
+
+    @classmethod
+    def get(cls, bot_rid, trx_price):
+        """根据TRX金额匹配套餐"""
+        cls.refresh()
+
+        # 套餐表为空（如开发环境）时回退到数据库查询
+        if not cls.index:
+            return EnergyPlatformPackageModel().get_by_trx_price(bot_rid, trx_price)
+
+        return cls.index.get((int(bot_rid), cls.normalize_price(trx_price)))
+
+
+class TransferSource(abc.ABC):
+    """TRX转入交易数据源基类"""
+
+    name = ''
+    key_type = ''
+
+    async def fetch_async(self, wallet_info, start_timestamp, end_timestamp):
+        """拉取时间范围内的转入交易，逐页收集 (受每轮分页预算限制)，返回标准化交易列表，请求失败返回None"""
+        transfers = []
+        async for page in self.iter_pages(wallet_info, start_timestamp, end_timestamp):
+            if page is None:
+                return None
+            transfers.extend(page)
+        return transfers
+
+    @abc.abstractmethod
+    def iter_pages(self, wallet_info, start_timestamp, end_timestamp):
+        """按时间正序逐页产出标准化交易 (异步生成器)，请求失败时产出None后结束"""
+
+    async def request_page(self, url):
+        """异步请求一页数据，请求失败返回None"""
+        api_key = await EnergyUtils.acquire_api_key_async(self.key_type)
+        headers = {"TRON-PRO-API-KEY": api_key}
 
+        response = await EnergyUtils.send_http_request_async(url, None, headers)
+        if not response:
+            return None
+
+        try:
+            return json.loads(response)
+        except json.JSONDecodeError:
+            EnergyUtils.log('TRX_TRADE_ERROR', f'解析{self.name}交易数据失败: {response}')
+            return None
+
+    def build_transfer(self, tx_hash, from_address, to_address, amount, timestamp):
+        """构建标准化交易"""
+        return {
+            'tx_hash': tx_hash,
+            'from_address': from_address,
+            'to_address': to_address,
+            'amount': amount,
+            'timestamp': int(timestamp or 0),
+            'source': self.name
+        }
 
-class EnergyWalletTradeTrxServices:
-    """能量钱包TRX交易服务"""
+
+class TronScanTransferSource(TransferSource):
+    """tronscan数据源"""
+
+    name = 'tronscan'
+    key_type = 'tronapikey'
 
     def __init__(self):
         self.limit = 50
 
-    def get_list(self, wallet_info, start_timestamp, end_timestamp, page=0):
-        """获取能量钱包数据 - 通过tronscan获取"""
-        limit = self.limit
-        start = page * limit
-
-        url = (
+    def page_url(self, receive_wallet, start_timestamp, end_timestamp, page):
+        """分页地址 (按时间正序，分页预算用尽时已入库部分是完整前缀)"""
+        return (
             "https://apilist.tronscanapi.com/api/new/transfer"
-            "?sort=-timestamp&count=true&limit={}&start={}&address={}&toAddress={}&tokens=_&start_timestamp={}&end_timestamp={}"
-        ).format(limit, start, wallet_info['receive_wallet'], wallet_info['receive_wallet'], start_timestamp, end_timestamp)
+            "?sort=timestamp&count=true&limit={}&start={}&address={}&toAddress={}&tokens=_&start_timestamp={}&end_timestamp={}"
+        ).format(self.limit, page * self.limit, receive_wallet, receive_wallet, start_timestamp, end_timestamp)
+
+    async def iter_pages(self, wallet_info, start_timestamp, end_timestamp):
+        """逐页拉取，处理当前页时预取下一页"""
+        receive_wallet = wallet_info['receive_wallet']
+        max_pages = TASK_CONFIG['ingest']['max_pages_per_cycle']
+        page = 0
+
+        pending = asyncio.ensure_future(self.request_page(self.page_url(receive_wallet, start_timestamp, end_timestamp, page)))
+        try:
+            while pending is not None:
+                data = await pending
+                pending = None
+                if data is None:
+                    yield None
+                    return
+
+                transactions = data.get('data') or []
+                page += 1
+
+                if data.get('total', 0) > page * self.limit and len(transactions) == self.limit:
+                    if page < max_pages:
+                        # 预取下一页
+                        pending = asyncio.ensure_future(self.request_page(self.page_url(receive_wallet, start_timestamp, end_timestamp, page)))
+                    else:
+                        EnergyUtils.log('TRX_TRADE_SOURCE', f'{self.name} 达到每轮分页上限 {max_pages}，剩余交易下轮继续: {receive_wallet}')
+
+                yield [
+                    self.build_transfer(
+                        tx.get('transactionHash'),
+                        tx.get('transferFromAddress'),
+                        receive_wallet,
+                        EnergyUtils.calculate_amount(tx.get('amount', 0), 6),
+                        tx.get('timestamp')
+                    )
+                    for tx in transactions
+                    if (tx.get('contractRet') == 'SUCCESS'
+                        and tx.get('tokenInfo', {}).get('tokenId') == '_'
+                        and tx.get('tokenInfo', {}).get('tokenAbbr') == 'trx')
+                ]
+        finally:
+            if pending is not None:
+                pending.cancel()
 
-        api_key = EnergyUtils.get_random_api_key('tronapikey')
-        headers = {"TRON-PRO-API-KEY": api_key}
 
-        response = EnergyUtils.send_http_request(url, headers=headers)
-        if response:
-            try:
-                data = json.loads(response)
-                if 'total' in data and data.get('data'):
-                    self.handle_wallet_data(data, wallet_info, start_timestamp, end_timestamp, page, limit)
-            except json.JSONDecodeError:
-                EnergyUtils.log('TRX_TRADE_ERROR', f'解析TRX交易数据失败: {response}')
+class TronGridTransferSource(TransferSource):
+    """trongrid数据源"""
 
-    def handle_wallet_data(self, data, wallet_info, start_timestamp, end_timestamp, page, limit):
-        """处理收款数据"""
-        if 'data' in data:
-            transactions = data['data']
-            total = data.get('total', 0)
+    name = 'trongrid'
+    key_type = 'gridapikey'
 
-            if transactions:
-                hash_list = [tx.get('transactionHash') for tx in transactions]
-                existing_hashes = self.check_existing_hashes(hash_list)
+    def __init__(self):
+        self.limit = 200
 
-                current_time = EnergyUtils.now_date()
+    async def iter_pages(self, wallet_info, start_timestamp, end_timestamp):
+        """逐页拉取 (下一页地址依赖当前页的 fingerprint，无法预取)"""
+        receive_wallet = wallet_info['receive_wallet']
+        max_pages = TASK_CONFIG['ingest']['max_pages_per_cycle']
 
-                for tx in transactions:
-                    if (tx.get('transactionHash') not in existing_hashes
-                        and tx.get('contractRet') == 'SUCCESS'
-                        and EnergyUtils.calculate_amount(tx.get('amount', 0), 6) >= 1
-                        and tx.get('tokenInfo', {}).get('tokenId') == '_'
-                        and tx.get('tokenInfo', {}).get('tokenAbbr') == 'trx'):
+        url = (
+            "https://api.trongrid.io/v1/accounts/{}/transactions"
+            "?only_to=true&only_confirmed=true&order_by=block_timestamp,asc&limit={}&min_timestamp={}&max_timestamp={}"
+        ).format(receive_wallet, self.limit, start_timestamp, end_timestamp)
+
+        for page in range(max_pages):
+            data = await self.request_page(url)
+            if data is None or not data.get('success', True):
+                if data is not None:
+                    EnergyUtils.log('TRX_TRADE_ERROR', f'trongrid返回错误: {data.get("error")}')
+                yield None
+                return
+
+            transfers = []
+            for tx in data.get('data') or []:
+                contracts = tx.get('raw_data', {}).get('contract') or []
+                ret = tx.get('ret') or [{}]
+                if not contracts or contracts[0].get('type') != 'TransferContract':
+                    continue
+                if ret[0].get('contractRet') != 'SUCCESS':
+                    continue
+
+                value = contracts[0].get('parameter', {}).get('value', {})
+                if EnergyUtils.hex_to_base58(value.get('to_address')) != receive_wallet:
+                    continue
+
+                transfers.append(self.build_transfer(
+                    tx.get('txID'),
+                    EnergyUtils.hex_to_base58(value.get('owner_address')),
+                    receive_wallet,
+                    EnergyUtils.calculate_amount(value.get('amount', 0), 6),
+                    tx.get('block_timestamp')
+                ))
+
+            yield transfers
+
+            # 处理下一页
+            url = data.get('meta', {}).get('links', {}).get('next')
+            if not url:
+                return
+
+        EnergyUtils.log('TRX_TRADE_SOURCE', f'{self.name} 达到每轮分页上限 {max_pages}，剩余交易下轮继续: {receive_wallet}')
 
-                        self.add_wallet_data(tx, current_time, wallet_info)
 
-                # 分页处理
-                get_total = (page + 1) * limit
-                if total > get_total and len(transactions) == limit:
-                    self.get_list(wallet_info, start_timestamp, end_timestamp, page + 1)
+class EnergyWalletTradeTrxServices:
+    """能量钱包TRX交易服务"""
 
-    def add_wallet_data(self, tx_data, current_time, wallet_info):
-        """添加钱包交易数据"""
-        tx_record = {
-            'tx_hash': tx_data.get('transactionHash'),
-            'transferfrom_address': tx_data.get('transferFromAddress'),
-            'timestamp': tx_data.get('timestamp'),
+    sources = {
+        'tronscan': TronScanTransferSource,
+        'trongrid': TronGridTransferSource
+    }
+
+    def __init__(self):
+        source_config = TRON_CONFIG['transfer_sources']
+        self.source_list = [self.sources[name]() for name in source_config['trx'] if name in self.sources]
+        self.cross_check = source_config.get('cross_check', False)
+
+    async def get_list_async(self, wallet_info, start_timestamp, end_timestamp):
+        """获取能量钱包数据并入库 (返回拉取到的最新交易时间戳，全部数据源失败或入库失败返回None)"""
+        transfers = await self.fetch_transfers(wallet_info, start_timestamp, end_timestamp)
+        if transfers is None:
+            return None
+
+        current_time = EnergyUtils.now_date()
+        records = [
+            self.build_wallet_data(tx, current_time, wallet_info)
+            for tx in transfers
+            if tx['amount'] >= 1
+        ]
+
+        # 一次性幂等写入 (已存在的交易由唯一键去重)，写入失败时不推进游标
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, self.add_wallet_data, records) is None:
+            return None
+
+        return max([tx['timestamp'] for tx in transfers], default=0)
+
+    async def fetch_transfers(self, wallet_info, start_timestamp, end_timestamp):
+        """按顺序请求数据源，在内存中合并去重"""
+        merged = {}
+        source_hashes = {}
+
+        for source in self.source_list:
+            transfers = await source.fetch_async(wallet_info, start_timestamp, end_timestamp)
+            if transfers is None:
+                EnergyUtils.log('TRX_TRADE_SOURCE', f'{source.name} 拉取失败，切换下一个数据源: {wallet_info["receive_wallet"]}')
+                continue
+
+            source_hashes[source.name] = {tx['tx_hash'] for tx in transfers}
+            for tx in transfers:
+                merged.setdefault(tx['tx_hash'], tx)
+
+            if not self.cross_check:
+                break
+
+        if not source_hashes:
+            return None
+
+        if self.cross_check and len(source_hashes) > 1:
+            self.report_mismatch(wallet_info, source_hashes)
+
+        return list(merged.values())
+
+    def report_mismatch(self, wallet_info, source_hashes):
+        """记录各数据源之间不一致的交易"""
+        all_hashes = set().union(*source_hashes.values())
+        for name, hashes in source_hashes.items():
+            missing = all_hashes - hashes
+            if missing:
+                EnergyUtils.log('TRX_TRADE_CROSS_CHECK', f'{name} 缺少 {len(missing)} 笔交易: {wallet_info["receive_wallet"]} {sorted(missing)[:5]}')
+
+    def build_wallet_data(self, tx_data, current_time, wallet_info):
+        """构建钱包交易数据"""
+        return {
+            'tx_hash': tx_data['tx_hash'],
+            'transferfrom_address': tx_data['from_address'],
+            'timestamp': tx_data['timestamp'],
             'transferto_address': wallet_info['receive_wallet'],
             'coin_name': 'trx',
-            'amount': EnergyUtils.calculate_amount(tx_data.get('amount', 0), 6),
+            'amount': tx_data['amount'],
             'get_time': current_time,
             'process_status': 1,
             'process_comments': '待处理',
             'process_time': current_time
         }
 
-        model = EnergyWalletTradeListModel()
-        model.insert(tx_record)
+    def add_wallet_data(self, records):
+        """批量添加钱包交易数据 (返回新增行数，写入失败返回None)"""
+        if not records:
+            return 0
 
-    def check_existing_hashes(self, hash_list):
-        """检查已存在的交易哈希"""
         model = EnergyWalletTradeListModel()
-        return model.get_by_tx_hash(hash_list)
+        inserted = model.ingest_transactions(records)
+
+        # 新入账交易直接交给事件管道下单
+        if inserted:
+            EnergyOrderPipeline.publish([record['tx_hash'] for record in records])
+        return inserted
 
 
 class EnergyWalletTradeUsdtServices:
     """能量钱包USDT交易服务"""
 
-    def get_list(self, wallet_info, start_timestamp, next_url='0'):
-        """获取闪兑钱包数据"""
-        if next_url != '0':
-            url = next_url
-        else:
-            url = (
-                "https://api.trongrid.io/v1/accounts/{}/transactions/trc20"
-                "?limit=50&only_to=true&min_timestamp={}&contract_address=TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
-            ).format(wallet_info['receive_wallet'], start_timestamp)
-
-        api_key = EnergyUtils.get_random_api_key('gridapikey')
-        headers = {"TRON-PRO-API-KEY": api_key}
+    def __init__(self):
+        self.limit = 50
+
+    async def get_list_async(self, wallet_info, start_timestamp):
+        """获取闪兑钱包数据，逐页拉取并入库 (返回拉取到的最新交易时间戳，请求失败或入库失败返回None)"""
+        loop = asyncio.get_running_loop()
+        newest_timestamp = 0
+        async for transactions in self.iter_pages(wallet_info, start_timestamp):
+            if transactions is None:
+                return None
+            if not transactions:
+                continue
+
+            newest_timestamp = max(newest_timestamp, max(int(tx.get('block_timestamp') or 0) for tx in transactions))
+            current_time = EnergyUtils.now_date()
+
+            records = [
+                self.build_wallet_data(tx, current_time, wallet_info)
+                for tx in transactions
+                if tx.get('type') == 'Transfer'
+            ]
+
+            # 整页一次性幂等写入 (已存在的交易由唯一键去重)，写入失败时不推进游标
+            if await loop.run_in_executor(None, self.add_wallet_data, records) is None:
+                return None
+
+        return newest_timestamp
+
+    async def iter_pages(self, wallet_info, start_timestamp):
+        """按时间正序逐页拉取 (异步生成器)，请求失败时产出None后结束"""
+        max_pages = TASK_CONFIG['ingest']['max_pages_per_cycle']
+        url = (
+            "https://api.trongrid.io/v1/accounts/{}/transactions/trc20"
+            "?limit={}&only_to=true&order_by=block_timestamp,asc&min_timestamp={}&contract_address=TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+        ).format(wallet_info['receive_wallet'], self.limit, start_timestamp)
+
+        for page in range(max_pages):
+            api_key = await EnergyUtils.acquire_api_key_async('gridapikey')
+            headers = {"TRON-PRO-API-KEY": api_key}
+
+            response = await EnergyUtils.send_http_request_async(url, None, headers)
+            if not response:
+                yield None
+                return
 
-        response = EnergyUtils.send_http_request(url, headers=headers)
-        if response:
             try:
                 data = json.loads(response)
-                self.handle_wallet_data(data, wallet_info)
             except json.JSONDecodeError:
                 EnergyUtils.log('USDT_TRADE_ERROR', f'解析USDT交易数据失败: {response}')
+                yield None
+                return
 
-    def handle_wallet_data(self, data, wallet_info):
-        """处理收款数据"""
-        if 'data' in data:
-            transactions = data['data']
-
-            if transactions:
-                hash_list = [tx.get('transaction_id') for tx in transactions]
-                existing_hashes = self.check_existing_hashes(hash_list)
-
-                current_time = EnergyUtils.now_date()
+            yield data.get('data') or []
 
-                for tx in transactions:
-                    if tx.get('transaction_id') not in existing_hashes and tx.get('type') == 'Transfer':
-                        self.add_wallet_data(tx, current_time, wallet_info)
+            # 处理下一页
+            url = data.get('meta', {}).get('links', {}).get('next')
+            if not url:
+                return
 
-                # 处理下一页
-                if 'meta' in data and 'links' in data['meta'] and 'next' in data['meta']['links']:
-                    self.get_list(wallet_info, 0, data['meta']['links']['next'])
+        EnergyUtils.log('USDT_TRADE_SOURCE', f'达到每轮分页上限 {max_pages}，剩余交易下轮继续: {wallet_info["receive_wallet"]}')
 
-    def add_wallet_data(self, tx_data, current_time, wallet_info):
-        """添加钱包交易数据"""
-        tx_record = {
+    def build_wallet_data(self, tx_data, current_time, wallet_info):
+        """构建钱包交易数据"""
+        return {
             'tx_hash': tx_data.get('transaction_id'),
             'transferfrom_address': tx_data.get('from'),
             'timestamp': tx_data.get('block_timestamp'),
@@ -180,10 +485,199 @@ class EnergyWalletTradeUsdtServices:
             'process_time': current_time
         }
 
+    def add_wallet_data(self, records):
+        """批量添加钱包交易数据 (返回新增行数，写入失败返回None)"""
+        if not records:
+            return 0
+
         model = EnergyWalletTradeListModel()
-        model.insert(tx_record)
+        inserted = model.ingest_transactions(records)
+
+        # 新入账交易直接交给事件管道下单
+        if inserted:
+            EnergyOrderPipeline.publish([record['tx_hash'] for record in records])
+        return inserted
+
+
+class EnergyBlockScanServices:
+    """区块扫描入账服务 - 一次扫描覆盖全部收款钱包"""
+
+    # 全局游标使用的伪钱包地址
+    CURSOR_WALLET = '*'
+
+    def __init__(self, wallet_map):
+        # {receive_wallet: wallet_info}
+        self.wallet_map = wallet_map
+        self.config = TRON_CONFIG['block_scan']
+        self.api_url = TRON_CONFIG['networks']['mainnet']
+        self.cursor_model = EnergyWalletTradeCursorModel()
+
+    def request(self, path, data=None, method='GET'):
+        """请求trongrid接口"""
+        url = path if path.startswith('http') else self.api_url + path
+        api_key = EnergyUtils.acquire_api_key('gridapikey')
+        headers = {"TRON-PRO-API-KEY": api_key}
+
+        response = EnergyUtils.send_http_request(url, data, headers, method)
+        if not response:
+            return None
+
+        try:
+            return json.loads(response)
+        except json.JSONDecodeError:
+            EnergyUtils.log('BLOCK_SCAN_ERROR', f'解析trongrid数据失败: {response[:200]}')
+            return None
+
+    def scan_trx_blocks(self):
+        """扫描新区块中的TRX转账"""
+        now_block = self.request('/wallet/getnowblock', {}, method='POST')
+        if not now_block or 'block_header' not in now_block:
+            return 0
+
+        confirmed_number = now_block['block_header']['raw_data']['number'] - self.config['confirmations']
+        last_number = self.cursor_model.get_last_block_number(self.CURSOR_WALLET, 'trx')
+
+        if not last_number:
+            # 首次扫描：按初始回溯时长折算区块数 (约3秒一个区块)
+            last_number = confirmed_number - TASK_CONFIG['ingest']['initial_lookback'] // 3
+
+        end_number = min(confirmed_number, last_number + self.config['max_blocks_per_cycle'])
+        ingested = 0
+
+        start_number = last_number + 1
+        while start_number <= end_number:
+            batch_end = min(start_number + self.config['batch_blocks'], end_number + 1)
+            data = self.request(
+                '/wallet/getblockbylimitnext',
+                {'startNum': start_number, 'endNum': batch_end, 'visible': True},
+                method='POST'
+            )
+            if data is None:
+                break
+
+            blocks = sorted(data.get('block') or [], key=lambda b: b['block_header']['raw_data']['number'])
+            if len(blocks) < batch_end - start_number:
+                # 节点返回的区块不完整，下轮重试
+                break
+
+            current_time = EnergyUtils.now_date()
+            records = []
+            for block in blocks:
+                block_timestamp = block['block_header']['raw_data'].get('timestamp', 0)
+                for tx in block.get('transactions') or []:
+                    record = self.build_trx_record(tx, block_timestamp, current_time)
+                    if record:
+                        records.append(record)
+
+            # 写入失败时不推进游标，下轮重新扫描这批区块
+            inserted = self.add_wallet_data(records)
+            if inserted is None:
+                break
+            ingested += inserted
+
+            last_block = blocks[-1]['block_header']['raw_data']
+            self.cursor_model.advance_block_number(self.CURSOR_WALLET, 'trx', last_block['number'], last_block.get('timestamp', 0))
+            start_number = batch_end
+
+        return ingested
+
+    def build_trx_record(self, tx, block_timestamp, current_time):
+        """区块交易匹配收款钱包，生成交易记录"""
+        contracts = tx.get('raw_data', {}).get('contract') or []
+        ret = tx.get('ret') or [{}]
+        if not contracts or contracts[0].get('type') != 'TransferContract':
+            return None
+        if ret[0].get('contractRet', 'SUCCESS') != 'SUCCESS':
+            return None
+
+        value = contracts[0].get('parameter', {}).get('value', {})
+        to_address = value.get('to_address')
+        if to_address not in self.wallet_map:
+            return None
+
+        amount = EnergyUtils.calculate_amount(value.get('amount', 0), 6)
+        if amount < 1:
+            return None
+
+        return self.build_wallet_data(tx.get('txID'), value.get('owner_address'), to_address, 'trx', amount, block_timestamp, current_time)
+
+    def scan_usdt_events(self):
+        """扫描USDT合约的Transfer事件"""
+        last_timestamp = self.cursor_model.get_last_timestamp(self.CURSOR_WALLET, 'usdt')
+        if not last_timestamp:
+            last_timestamp = (int(time.time()) - TASK_CONFIG['ingest']['initial_lookback']) * 1000
+
+        url = (
+            "{}/v1/contracts/{}/events"
+            "?event_name=Transfer&only_confirmed=true&order_by=block_timestamp,asc&limit={}&min_block_timestamp={}"
+        ).format(self.api_url, self.config['usdt_contract'], self.config['event_page_limit'], last_timestamp)
+
+        ingested = 0
+        pages = 0
+        while url and pages < self.config['max_event_pages']:
+            data = self.request(url)
+            if data is None:
+                break
+
+            current_time = EnergyUtils.now_date()
+            records = []
+            newest_timestamp = 0
+            for event in data.get('data') or []:
+                newest_timestamp = max(newest_timestamp, int(event.get('block_timestamp') or 0))
+                result = event.get('result') or {}
+                to_address = EnergyUtils.hex_to_base58(result.get('to'))
+                if to_address not in self.wallet_map:
+                    continue
+
+                records.append(self.build_wallet_data(
+                    event.get('transaction_id'),
+                    EnergyUtils.hex_to_base58(result.get('from')),
+                    to_address,
+                    'usdt',
+                    EnergyUtils.calculate_amount(int(result.get('value') or 0), 6),
+                    event.get('block_timestamp'),
+                    current_time
+                ))
+
+            # 写入失败时不推进游标，下轮重新拉取这一页
+            inserted = self.add_wallet_data(records)
+            if inserted is None:
+                break
+            ingested += inserted
+
+            # 按时间正序拉取，整页入库后推进游标
+            if newest_timestamp:
+                self.cursor_model.advance(self.CURSOR_WALLET, 'usdt', newest_timestamp)
+
+            url = data.get('meta', {}).get('links', {}).get('next')
+            pages += 1
+
+        return ingested
+
+    def build_wallet_data(self, tx_hash, from_address, to_address, coin_name, amount, timestamp, current_time):
+        """构建钱包交易数据"""
+        return {
+            'tx_hash': tx_hash,
+            'transferfrom_address': from_address,
+            'timestamp': timestamp,
+            'transferto_address': to_address,
+            'coin_name': coin_name,
+            'amount': amount,
+            'get_time': current_time,
+            'process_status': 1,
+            'process_comments': '待处理',
+            'process_time': current_time
+        }
+
+    def add_wallet_data(self, records):
+        """批量添加钱包交易数据 (返回新增行数，写入失败返回None)"""
+        if not records:
+            return 0
 
-    def check_existing_hashes(self, hash_list):
-        """检查已存在的交易哈希"""
         model = EnergyWalletTradeListModel()
-        return model.get_by_tx_hash(hash_list)
+        inserted = model.ingest_transactions(records)
+
+        # 新入账交易直接交给事件管道下单
+        if inserted:
+            EnergyOrderPipeline.publish([record['tx_hash'] for record in records])
+        return inserted
@@ -0,0 +1,89 @@
+"""
+能量订单事件管道
+"""
+
+import queue
+import threading
+from energy_rental_bot.models.energy_models import EnergyWalletTradeListModel
+from energy_rental_bot.config.config import TASK_CONFIG
+from energy_rental_bot.utils.energy_utils import EnergyUtils
+
+
+class EnergyOrderPipeline:
+    """能量订单事件管道 - 入账后立即下单并通知 (进程内队列，数据库为持久记录，分钟轮询作为补偿)"""
+
+    order_queue = queue.Queue()
+    notify_queue = queue.Queue()
+    workers = []
+    running = False
+
+    @classmethod
+    def start(cls):
+        """启动管道工作线程"""
+        config = TASK_CONFIG['pipeline']
+        if not config['enabled'] or cls.running:
+            return
+
+        cls.running = True
+        for i in range(config['order_workers']):
+            cls.start_worker(cls.order_queue, cls.handle_order, f'order-pipeline-{i}')
+        for i in range(config['notify_workers']):
+            cls.start_worker(cls.notify_queue, cls.handle_notify, f'notify-pipeline-{i}')
+
+        EnergyUtils.log('ORDER_PIPELINE', f"已启动 下单线程 {config['order_workers']} 个，通知线程 {config['notify_workers']} 个")
+
+    @classmethod
+    def stop(cls):
+        """停止管道 (未处理的事件由轮询补偿处理)"""
+        if not cls.running:
+            return
+
+        cls.running = False
+        for worker in cls.workers:
+            worker_queue = cls.order_queue if worker.name.startswith('order') else cls.notify_queue
+            worker_queue.put(None)
+        cls.workers = []
+
+    @classmethod
+    def start_worker(cls, work_queue, handler, name):
+        """启动单个工作线程"""
+        def run():
+            while True:
+                item = work_queue.get()
+                if item is None:
+                    break
+                try:
+                    handler(item)
+                except Exception as e:
+                    EnergyUtils.log('ORDER_PIPELINE', f'{name} 处理失败: {str(e)}')
+
+        worker = threading.Thread(target=run, name=name, daemon=True)
+        worker.start()
+        cls.workers.append(worker)
+
+    @classmethod
+    def publish(cls, tx_hashes):
+        """发布新入账的交易"""
+        if cls.running and tx_hashes:
+            cls.order_queue.put(list(tx_hashes))
+
+    @classmethod
+    def handle_order(cls, tx_hashes):
+        """下单阶段：处理新入账的待处理交易，成功后进入通知阶段"""
+        # 避免循环导入
+        from energy_rental_bot.tasks.handle_energy_order_task import HandleEnergyOrderTask
+
+        order_task = HandleEnergyOrderTask()
+        transactions = EnergyWalletTradeListModel().get_pending_by_tx_hash(tx_hashes)
+
+        for transaction in transactions:
+            if order_task.process_transaction(transaction):
+                cls.notify_queue.put(transaction['rid'])
+
+    @classmethod
+    def handle_notify(cls, rid):
+        """通知阶段：发送下单成功通知"""
+        # 避免循环导入
+        from energy_rental_bot.tasks.send_energy_tg_message_task import SendEnergyTgMessageTask
+
+        SendEnergyTgMessageTask().send_self_order_notification(rid)
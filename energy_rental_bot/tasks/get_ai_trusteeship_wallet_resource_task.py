@@ -4,13 +4,111 @@
 
 import json
 import time
-from energy_rental_bot.models.energy_models import EnergyAiTrusteeshipModel, EnergyAiBishuModel
-from energy_rental_bot.utils.energy_utils import EnergyUtils, Concurrent
+import heapq
+import asyncio
+import threading
+from energy_rental_bot.models.energy_models import EnergyAiTrusteeshipModel, EnergyAiBishuModel, EnergyPlatformOrderModel
+from energy_rental_bot.tasks.handle_ai_energy_order_task import HandleAiEnergyOrderTask
+from energy_rental_bot.config.config import TASK_CONFIG
+from energy_rental_bot.utils.energy_utils import EnergyUtils, LruCache, Concurrent
+
+
+class ResourcePollScheduler:
+    """钱包资源轮询调度器 - 按能量消耗速度预测下次检查时间 (优先队列)"""
+
+    def __init__(self):
+        self.heap = []
+        self.states = {}
+        self.lock = threading.Lock()
+
+    def due(self, wallet_list, now=None):
+        """返回本轮需要检查的钱包 (新钱包立即检查，未调用 observe 的钱包在 max_interval 后重新检查)"""
+        if now is None:
+            now = time.time()
+        fallback_time = now + TASK_CONFIG['resource_check']['max_interval']
+        wallets = {wallet['wallet_addr']: wallet for wallet in wallet_list}
+
+        with self.lock:
+            # 已不在检查列表中的钱包（已触发购买/关闭托管）移出调度
+            for wallet_addr in list(self.states):
+                if wallet_addr not in wallets:
+                    del self.states[wallet_addr]
+
+            due_list = [wallet for wallet_addr, wallet in wallets.items() if wallet_addr not in self.states]
+
+            while self.heap and self.heap[0][0] <= now:
+                next_time, wallet_addr = heapq.heappop(self.heap)
+                state = self.states.get(wallet_addr)
+                # 跳过已失效的堆条目
+                if state and state['next_time'] == next_time:
+                    # 先安排兜底检查，检查中途异常时钱包不会脱离调度；observe 会覆盖为新的检查时间
+                    state['next_time'] = fallback_time
+                    heapq.heappush(self.heap, (fallback_time, wallet_addr))
+                    due_list.append(wallets[wallet_addr])
+
+        return due_list
+
+    def observe(self, wallet_addr, energy, threshold, lead_time=0, now=None):
+        """记录检查结果并安排下次检查 (energy 为 None 表示检查失败，lead_time 为额外提前量)"""
+        config = TASK_CONFIG['resource_check']
+        if now is None:
+            now = time.time()
+
+        with self.lock:
+            state = self.states.get(wallet_addr) or {
+                'energy': None,
+                'time': None,
+                'burn_rate': 0.0,
+                'samples': 0,
+                'failures': 0,
+                'next_time': None
+            }
+
+            if energy is None:
+                # 失败时按指数退避重试
+                state['failures'] += 1
+                interval = config['min_interval'] * 2 ** state['failures']
+            else:
+                state['failures'] = 0
+                if state['energy'] is not None and now > state['time']:
+                    rate = max(0.0, (state['energy'] - energy) / (now - state['time']))
+                    state['burn_rate'] += (rate - state['burn_rate']) * config['burn_alpha']
+                state['energy'] = energy
+                state['time'] = now
+                state['samples'] += 1
+
+                if state['burn_rate'] > 0:
+                    interval = (energy - threshold) / state['burn_rate'] - config['lead_time'] - lead_time
+                else:
+                    interval = config['max_interval']
+
+            interval = min(max(interval, config['min_interval']), config['max_interval'])
+            state['next_time'] = now + interval
+            self.states[wallet_addr] = state
+            heapq.heappush(self.heap, (state['next_time'], wallet_addr))
+
+    def get_burn_rate(self, wallet_addr):
+        """获取钱包能量消耗速度（能量/秒），检查次数不足两次时返回 None"""
+        with self.lock:
+            state = self.states.get(wallet_addr)
+            return state['burn_rate'] if state and state['samples'] >= 2 else None
 
 
 class GetAiTrusteeshipWalletResourceTask:
     """获取AI托管钱包资源任务"""
 
+    # 上次写库的资源快照 (wallet_addr -> (带宽, 能量))，按钱包类型分开保存
+    snapshots = {
+        'trusteeship': LruCache(TASK_CONFIG['resource_check']['snapshot_size']),
+        'bishu': LruCache(TASK_CONFIG['resource_check']['snapshot_size'])
+    }
+
+    # 自适应轮询调度器，按钱包类型分开调度
+    schedulers = {
+        'trusteeship': ResourcePollScheduler(),
+        'bishu': ResourcePollScheduler()
+    }
+
     def execute(self):
         """执行任务"""
         # 智能托管
@@ -21,64 +119,165 @@ class GetAiTrusteeshipWalletResourceTask:
     def check_trusteeship_wallets(self):
         """检查智能托管钱包"""
         model = EnergyAiTrusteeshipModel()
-        wallet_list = model.get_list_for_resource_check()
+        wallet_list = self.schedulers['trusteeship'].due(model.get_list_for_resource_check())
+        if not wallet_list:
+            return
 
-        concurrent = Concurrent(5)
-        for wallet in wallet_list:
-            concurrent.create(lambda w=wallet: self.check_wallet_resource(w, 'trusteeship'))
+        flagged = asyncio.run(self.check_wallets(model, wallet_list, 'trusteeship'))
+
+        # 有钱包需要补能时立即下单，不必等待下一个10分钟周期
+        if flagged:
+            HandleAiEnergyOrderTask().handle_trusteeship_orders()
 
     def check_bishu_wallets(self):
         """检查笔数套餐钱包"""
         model = EnergyAiBishuModel()
-        wallet_list = model.get_list_for_resource_check()
+        wallet_list = self.schedulers['bishu'].due(model.get_list_for_resource_check())
+        if wallet_list:
+            asyncio.run(self.check_wallets(model, wallet_list, 'bishu'))
+
+    async def check_wallets(self, model, wallet_list, wallet_type):
+        """分批并发查询钱包资源，每批合并为一条 UPDATE 写回 (写库与下一批查询并行)，返回标记购买的钱包数"""
+        config = TASK_CONFIG['resource_check']
+        refill_config = TASK_CONFIG['ai_refill']
+        forecast = wallet_type == 'trusteeship' and refill_config['enabled']
+        lead_time = refill_config['lead_time'] if forecast else 0
+        loop = asyncio.get_running_loop()
+        write_future = None
+        updated = 0
+        flagged = 0
+
+        for i in range(0, len(wallet_list), config['batch_size']):
+            batch = wallet_list[i:i + config['batch_size']]
+            # 查询失败/超时的钱包由 Concurrent 汇总记录，结果为异常对象
+            results = await Concurrent(config['concurrency']).run(
+                [lambda w=wallet: self.check_wallet_resource(w, wallet_type) for wallet in batch],
+                [wallet['wallet_addr'] for wallet in batch]
+            )
+
+            changed = []
+            for wallet, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    result = None
+
+                energy = result['current_energy_quantity'] if result else None
+                self.schedulers[wallet_type].observe(wallet['wallet_addr'], energy, self.get_threshold(wallet, wallet_type), lead_time)
 
-        concurrent = Concurrent(5)
-        for wallet in wallet_list:
-            concurrent.create(lambda w=wallet: self.check_wallet_resource(w, 'bishu'))
+            if forecast:
+                self.forecast_refills(batch, results)
 
-    def check_wallet_resource(self, wallet, wallet_type):
-        """检查钱包资源"""
-        # 避免API限制
-        time.sleep(1)
+            for wallet, result in zip(batch, results):
+                if isinstance(result, Exception) or not result:
+                    continue
+                if 'is_buy' in result:
+                    flagged += 1
+                if self.is_changed(wallet, result, wallet_type):
+                    changed.append((wallet['wallet_addr'], result))
 
-        # 调用tronscan API检查钱包资源
+            if write_future:
+                updated += await write_future
+                write_future = None
+            if changed:
+                write_future = loop.run_in_executor(None, self.write_batch, model, changed, wallet_type)
+
+        if write_future:
+            updated += await write_future
+
+        EnergyUtils.log('WALLET_RESOURCE_CHECK', f'{wallet_type} 检查钱包 {len(wallet_list)} 个，更新 {updated} 行')
+        return flagged
+
+    def forecast_refills(self, batch, results):
+        """预测能量耗尽时间，在 lead_time 内将低于阈值的托管钱包提前标记购买"""
+        config = TASK_CONFIG['ai_refill']
+        candidates = [
+            (wallet, result) for wallet, result in zip(batch, results)
+            if result and not isinstance(result, Exception) and 'is_buy' not in result
+        ]
+        if not candidates:
+            return
+
+        # 优先使用资源快照估算的消耗速度，没有快照时按近期AI下单量估算
+        scheduler = self.schedulers['trusteeship']
+        burn_rates = {wallet['wallet_addr']: scheduler.get_burn_rate(wallet['wallet_addr']) for wallet, _ in candidates}
+        unknown = [wallet_addr for wallet_addr, rate in burn_rates.items() if rate is None]
+        if unknown:
+            usage = EnergyPlatformOrderModel().get_ai_energy_usage(unknown, config['history_window'])
+            for wallet_addr in unknown:
+                burn_rates[wallet_addr] = usage.get(wallet_addr, 0) / config['history_window']
+
+        for wallet, result in candidates:
+            burn_rate = burn_rates[wallet['wallet_addr']]
+            if not burn_rate or wallet.get('is_buy') != 'N':
+                continue
+
+            seconds_left = (result['current_energy_quantity'] - self.get_threshold(wallet, 'trusteeship')) / burn_rate
+            if seconds_left <= config['lead_time']:
+                result['is_buy'] = 'Y'
+                EnergyUtils.log('AI_REFILL_FORECAST', f'{wallet["wallet_addr"]} 预计 {int(seconds_left)} 秒后能量低于阈值，提前补能')
+
+    def is_changed(self, wallet, row, wallet_type):
+        """资源是否需要写库 (数值变化或跨过购买阈值)"""
+        if 'is_buy' in row:
+            return True
+
+        # 无快照时（如重启后）与库中的当前值比较
+        previous = self.snapshots[wallet_type].get(wallet['wallet_addr'])
+        if previous is None:
+            previous = (wallet.get('current_bandwidth_quantity'), wallet.get('current_energy_quantity'))
+
+        return previous != (row['current_bandwidth_quantity'], row['current_energy_quantity'])
+
+    def write_batch(self, model, changed, wallet_type):
+        """批量写库，成功后更新快照"""
+        affected = model.update_many([row for _, row in changed])
+        if affected:
+            for wallet_addr, row in changed:
+                self.snapshots[wallet_type].set(wallet_addr, (row['current_bandwidth_quantity'], row['current_energy_quantity']))
+        return affected
+
+    async def check_wallet_resource(self, wallet, wallet_type):
+        """检查钱包资源，返回待更新的数据行"""
+        # 调用tronscan API检查钱包资源 (按key限流，额度不足时才等待)
         url = f'https://apilist.tronscanapi.com/api/accountv2?address={wallet["wallet_addr"]}'
-        api_key = EnergyUtils.get_random_api_key('tronapikey')
+        api_key = await EnergyUtils.acquire_api_key_async('tronapikey')
         headers = {"TRON-PRO-API-KEY": api_key}
 
-        response = EnergyUtils.send_http_request(url, headers=headers)
-
-        if response:
-            try:
-                data = json.loads(response)
-                if 'bandwidth' in data:
-                    # 只处理激活的地址
-                    is_active = data.get('activated', False)
-                    if is_active:
-                        bandwidth = data['bandwidth'].get('freeNetRemaining', 0) + data['bandwidth'].get('netRemaining', 0)
-                        energy = data['bandwidth'].get('energyRemaining', 0)
-
-                        update_data = {
-                            'current_bandwidth_quantity': bandwidth,
-                            'current_energy_quantity': energy
-                        }
-
-                        # 检查是否需要自动购买
-                        threshold = (
-                            wallet['min_energy_quantity']
-                            if wallet_type == 'trusteeship'
-                            else wallet['per_bishu_energy_quantity']
-                        )
-
-                        if energy < threshold and wallet.get('is_buy') == 'N':
-                            update_data['is_buy'] = 'Y'
-
-                        # 更新数据库
-                        if wallet_type == 'trusteeship':
-                            model = EnergyAiTrusteeshipModel()
-                        else:
-                            model = EnergyAiBishuModel()
-
-                        model.update(wallet['rid'], update_data)
-            except json.JSONDecodeError:
-                EnergyUtils.log('WALLET_RESOURCE_CHECK', f'解析钱包资源数据失败: {wallet["wallet_addr"]}')
+        response = await EnergyUtils.send_http_request_async(url, headers=headers)
+
+        if not response:
+            return None
+
+        try:
+            data = json.loads(response)
+        except json.JSONDecodeError:
+            EnergyUtils.log('WALLET_RESOURCE_CHECK', f'解析钱包资源数据失败: {wallet["wallet_addr"]}')
+            return None
+
+        # 只处理激活的地址
+        if 'bandwidth' not in data or not data.get('activated', False):
+            return None
+
+        bandwidth = data['bandwidth'].get('freeNetRemaining', 0) + data['bandwidth'].get('netRemaining', 0)
+        energy = data['bandwidth'].get('energyRemaining', 0)
+
+        update_data = {
+            'rid': wallet['rid'],
+            'current_bandwidth_quantity': bandwidth,
+            'current_energy_quantity': energy
+        }
+
+        # 检查是否需要自动购买
+        threshold = self.get_threshold(wallet, wallet_type)
+
+        if energy < threshold and wallet.get('is_buy') == 'N':
+            update_data['is_buy'] = 'Y'
+
+        return update_data
+
+    def get_threshold(self, wallet, wallet_type):
+        """获取钱包的自动购买能量阈值"""
+        return (
+            wallet['min_energy_quantity']
+            if wallet_type == 'trusteeship'
+            else wallet['per_bishu_energy_quantity']
+        )
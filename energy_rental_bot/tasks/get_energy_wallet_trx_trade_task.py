@@ -3,6 +3,9 @@
 """
 
 import time
+import asyncio
+from energy_rental_bot.config.config import TASK_CONFIG
+from energy_rental_bot.models.energy_models import EnergyWalletTradeCursorModel
 from energy_rental_bot.services.energy_services import EnergyWalletServices, EnergyWalletTradeTrxServices
 from energy_rental_bot.utils.energy_utils import EnergyUtils, Concurrent
 
@@ -16,27 +19,48 @@ class GetEnergyWalletTrxTradeTask:
         wallet_list = wallet_service.get_id_list(3)  # 获取定时任务过滤状态的钱包
 
         if wallet_list:
-            # 协程并发处理
-            concurrent = Concurrent(5)
-            for wallet in wallet_list:
-                concurrent.create(lambda w=wallet: self.process_wallet(w))
+            # 任务在线程池中执行，由本线程的事件循环并发处理全部钱包
+            asyncio.run(self.process_wallets(wallet_list))
 
-    def process_wallet(self, wallet):
+    async def process_wallets(self, wallet_list):
+        """协程并发处理钱包 (有界并发，单个钱包超时不影响其他钱包，异常汇总记录)"""
+        concurrent = Concurrent(timeout=TASK_CONFIG['ingest']['wallet_timeout'])
+        await concurrent.run(
+            [lambda w=wallet: self.process_wallet(w) for wallet in wallet_list],
+            [wallet['receive_wallet'] for wallet in wallet_list]
+        )
+
+    async def process_wallet(self, wallet):
         """处理单个钱包"""
         trade_service = EnergyWalletTradeTrxServices()
+        loop = asyncio.get_running_loop()
 
         # 获取最后处理时间
-        start_time = self.get_last_processed_time(wallet['receive_wallet'], 'trx')
+        start_time = await loop.run_in_executor(None, self.get_last_processed_time, wallet['receive_wallet'], 'trx')
         end_time = EnergyUtils.thirteen_time()
 
-        # 获取tronscan数据
-        trade_service.get_list(wallet, start_time, end_time)
+        # 按配置的数据源拉取 (tronscan 优先，失败时切换 trongrid)，合并去重后入库
+        newest_timestamp = await trade_service.get_list_async(wallet, start_time, end_time)
 
-        # 获取trongrid数据 (这里暂时使用相同的方法，实际应该有不同的实现)
-        trade_service.get_list(wallet, start_time, end_time)
+        # 全部分页拉取并入库成功后才推进游标，避免漏单
+        if newest_timestamp:
+            await loop.run_in_executor(None, self.save_processed_time, wallet['receive_wallet'], 'trx', newest_timestamp)
 
     def get_last_processed_time(self, wallet_addr, coin_name):
         """获取最后处理时间"""
-        # 这里应该从数据库查询最后处理时间
-        # 暂时返回1小时前的时间戳
-        return (int(time.time()) - 3600) * 1000
+        ingest_config = TASK_CONFIG['ingest']
+
+        model = EnergyWalletTradeCursorModel()
+        last_timestamp = model.get_last_timestamp(wallet_addr, coin_name)
+
+        if last_timestamp:
+            # 在游标基础上少量重叠回溯，重复交易由 uk_tx_hash 去重
+            return int(last_timestamp) - ingest_config['cursor_overlap'] * 1000
+
+        # 没有游标时回溯固定时长
+        return (int(time.time()) - ingest_config['initial_lookback']) * 1000
+
+    def save_processed_time(self, wallet_addr, coin_name, block_timestamp):
+        """保存最后处理时间"""
+        model = EnergyWalletTradeCursorModel()
+        model.advance(wallet_addr, coin_name, block_timestamp)
@@ -2,17 +2,15 @@
 处理能量订单任务
 """
 
-import json
-import hashlib
-import time
 from energy_rental_bot.models.energy_models import (
     EnergyWalletTradeListModel,
-    EnergyPlatformModel,
-    EnergyPlatformPackageModel,
     EnergyAiBishuModel,
     EnergyPlatformOrderModel
 )
-from energy_rental_bot.services.energy_services import EnergyWalletServices
+from energy_rental_bot.services.energy_services import EnergyWalletServices, EnergyPackagePriceIndex
+from energy_rental_bot.services.energy_platform_services import EnergyPlatformRouter
+from energy_rental_bot.services.energy_platform_adapters import EnergyPlatformAdapterRegistry
+from energy_rental_bot.config.config import TASK_CONFIG
 from energy_rental_bot.utils.energy_utils import EnergyUtils
 
 
@@ -22,6 +20,11 @@ class HandleEnergyOrderTask:
     def execute(self):
         """执行任务"""
         try:
+            # 回收租约过期的交易
+            recovered = EnergyWalletTradeListModel().recover_expired_leases()
+            if recovered:
+                EnergyUtils.log('HANDLE_ENERGY_ORDER', f'回收租约过期的交易 {recovered} 笔')
+
             # TRX闪租能量
             self.handle_trx_energy_orders()
             # USDT笔数套餐
@@ -31,77 +34,124 @@ class HandleEnergyOrderTask:
 
     def handle_trx_energy_orders(self):
         """处理TRX能量订单"""
+        self.handle_pending_orders('trx', self.process_trx_transaction)
+
+    def handle_usdt_energy_orders(self):
+        """处理USDT笔数套餐订单"""
+        self.handle_pending_orders('usdt', self.process_usdt_transaction)
+
+    def handle_pending_orders(self, coin_name, process):
+        """按批认领全部收款钱包的待处理交易 (每批一次查询，批次小到能在租约内处理完)，按收款钱包分组处理"""
         wallet_service = EnergyWalletServices()
         wallet_list = wallet_service.get_id_list(2)
 
-        if wallet_list:
-            current_time = EnergyUtils.now_date()
-            for wallet_addr, wallet_info in wallet_list.items():
-                platform_bot_rid = wallet_info['rid']
+        if not wallet_list:
+            return
 
-                # 获取待处理的TRX交易
-                pending_transactions = self.get_pending_trx_transactions(wallet_addr)
+        config = TASK_CONFIG['order_claim']
+        current_time = EnergyUtils.now_date()
+        after_rid = 0
 
-                for transaction in pending_transactions:
-                    self.process_trx_transaction(transaction, platform_bot_rid, current_time)
+        # 按 rid 递增认领，本轮失败释放的交易不会被重复认领
+        for _ in range(config['max_batches']):
+            worker_id = EnergyUtils.new_claim_token()
+            pending_transactions = self.claim_pending_transactions(coin_name, list(wallet_list.keys()), worker_id, after_rid)
+            if not pending_transactions:
+                break
 
-    def handle_usdt_energy_orders(self):
-        """处理USDT笔数套餐订单"""
-        wallet_service = EnergyWalletServices()
-        wallet_list = wallet_service.get_id_list(2)
+            for transaction in pending_transactions:
+                wallet_info = wallet_list.get(transaction['transferto_address'])
+                if not wallet_info:
+                    EnergyWalletTradeListModel().release_transaction(transaction['rid'], worker_id)
+                    continue
 
-        if wallet_list:
-            current_time = EnergyUtils.now_date()
-            for wallet_addr, wallet_info in wallet_list.items():
-                bot_rid = wallet_info['rid']
+                self.run_claimed(transaction, worker_id, lambda t, rid=wallet_info['rid']: process(t, rid, current_time))
 
-                # 获取待处理的USDT交易
-                pending_transactions = self.get_pending_usdt_transactions(wallet_addr)
+            if len(pending_transactions) < config['batch_size']:
+                break
+            after_rid = max(transaction['rid'] for transaction in pending_transactions)
+
+    def process_transaction(self, transaction):
+        """处理单笔新入账交易 (供事件管道调用)，下单成功返回 True"""
+        wallet_info = EnergyWalletServices().get_id_list(2).get(transaction['transferto_address'])
+        if not wallet_info:
+            return False
+
+        current_time = EnergyUtils.now_date()
+        if transaction['coin_name'] == 'trx':
+            handler = lambda t: self.process_trx_transaction(t, wallet_info['rid'], current_time)
+        else:
+            handler = lambda t: self.process_usdt_transaction(t, wallet_info['rid'], current_time)
 
-                for transaction in pending_transactions:
-                    self.process_usdt_transaction(transaction, bot_rid, current_time)
+        return self.run_exclusive(transaction, handler)
 
-    def get_pending_trx_transactions(self, wallet_addr):
-        """获取待处理的TRX交易"""
+    def run_exclusive(self, transaction, handler):
+        """认领并处理一笔交易 (已被其他线程/实例认领或处理完成时跳过)"""
+        worker_id = EnergyUtils.new_claim_token()
         model = EnergyWalletTradeListModel()
-        return model.get_pending_transactions('trx', wallet_addr)
+        if not model.claim_transaction(transaction['rid'], worker_id, TASK_CONFIG['order_claim']['lease_seconds']):
+            return False
+
+        return self.run_claimed(transaction, worker_id, handler)
 
-    def get_pending_usdt_transactions(self, wallet_addr):
-        """获取待处理的USDT交易"""
+    def run_claimed(self, transaction, worker_id, handler):
+        """处理已认领的交易，未更新为最终状态时释放回待处理"""
+        transaction['worker_id'] = worker_id
+        try:
+            return bool(handler(transaction))
+        finally:
+            EnergyWalletTradeListModel().release_transaction(transaction['rid'], worker_id)
+
+    def claim_pending_transactions(self, coin_name, wallet_addrs, worker_id, after_rid=0):
+        """认领收款钱包待处理的交易"""
+        config = TASK_CONFIG['order_claim']
         model = EnergyWalletTradeListModel()
-        return model.get_pending_transactions('usdt', wallet_addr)
+        return model.claim_pending_transactions(
+            coin_name, wallet_addrs, worker_id, config['lease_seconds'], config['batch_size'], after_rid
+        )
 
     def process_trx_transaction(self, transaction, platform_bot_rid, current_time):
         """处理TRX交易"""
         # 匹配金额对应的套餐
-        package_model = EnergyPlatformPackageModel()
-        package = package_model.get_by_trx_price(transaction['bot_rid'], transaction['amount'])
+        package = EnergyPackagePriceIndex.get(transaction['bot_rid'], transaction['amount'])
 
         if not package:
-            self.update_transaction_status(transaction['rid'], 7, '金额无对应套餐', current_time)
+            self.update_transaction_status(transaction, 7, '金额无对应套餐', current_time)
             return
 
         energy_amount = package['energy_amount']
 
-        # 轮询获取可用平台
-        platform_model = EnergyPlatformModel()
-        available_platforms = platform_model.get_available_platforms(energy_amount, transaction['poll_group'])
+        # 获取可用平台 (按轮询分组、余额、成功率/延迟选择)
+        available_platforms = EnergyPlatformRouter.select(energy_amount, transaction.get('poll_group'))
 
         if not available_platforms:
-            self.update_transaction_status(transaction['rid'], 4, '机器人无可用能量平台', current_time)
+            self.update_transaction_status(transaction, 4, '机器人无可用能量平台', current_time)
             return
 
+        # 下单前续约，租约已过期（交易可能已被其他实例重新认领）时跳过
+        if not self.renew_lease(transaction):
+            return False
+
         # 尝试下单
-        for platform in available_platforms:
-            result = self.place_energy_order(platform, transaction['transferfrom_address'], energy_amount, package['energy_day'])
+        platform, result = EnergyPlatformRouter.place(
+            available_platforms,
+            energy_amount,
+            lambda p: EnergyPlatformAdapterRegistry.place_order(p, transaction['transferfrom_address'], energy_amount, package['energy_day']),
+            lambda p, r: self.create_platform_order(p, transaction, energy_amount, package, current_time, source_type=4)
+        )
 
-            if result['success']:
-                self.create_platform_order(platform, transaction, energy_amount, package, current_time)
-                self.update_transaction_status(transaction['rid'], 9, 'SUCCESS', current_time, platform['rid'], package['rid'])
-                break
+        if not platform:
+            return False
+
+        self.create_platform_order(platform, transaction, energy_amount, package, current_time)
+        return self.update_transaction_status(transaction, 9, 'SUCCESS', current_time, platform['rid'], package['rid'])
 
     def process_usdt_transaction(self, transaction, bot_rid, current_time):
         """处理USDT交易"""
+        # 入账前续约，租约已过期（交易可能已被其他实例重新认领）时跳过
+        if not self.renew_lease(transaction):
+            return False
+
         # 查询笔数套餐钱包是否存在
         bishu_model = EnergyAiBishuModel()
         bishu_wallet = bishu_model.get_by_wallet_addr(transaction['transferfrom_address'])
@@ -125,144 +175,10 @@ class HandleEnergyOrderTask:
             }
             bishu_model.insert(insert_data)
 
-        self.update_transaction_status(transaction['rid'], 9, '笔数套餐购买成功', current_time)
-
-    def place_energy_order(self, platform, address, energy_amount, energy_day):
-        """调用相应平台的API下单"""
-        # 根据平台类型调用不同的API
-        platform_name = platform['platform_name']
-
-        if platform_name == 1:  # nee.cc
-            return self.place_nee_order(platform, address, energy_amount, energy_day)
-        elif platform_name == 2:  # RentEnergysBot
-            return self.place_rent_energy_order(platform, address, energy_amount, energy_day)
-        elif platform_name == 3:  # 自己质押
-            return self.place_self_stake_order(platform, address, energy_amount)
-        elif platform_name == 4:  # trongas.io
-            return self.place_trongas_order(platform, address, energy_amount, energy_day)
-        else:
-            return {'success': False, 'message': '不支持的平台类型'}
-
-    def place_nee_order(self, platform, address, energy_amount, energy_day):
-        """调用nee.cc API"""
-        param = {
-            "uid": platform['platform_uid'],
-            "resource_type": "0",
-            "receive_address": address,
-            "amount": str(energy_amount),
-            "freeze_day": str(energy_day),
-            "time": str(int(time.time()))
-        }
-
-        # 添加签名
-        sorted_param = sorted(param.items())
-        sign_str = ''.join([f"{k}{v}" for k, v in sorted_param if k not in ["sign", "sign_type"] and v != ''])
-        param['sign'] = hashlib.md5(sign_str.encode()).hexdigest()
-
-        url = 'https://api.tronqq.com/openapi/v2/order/submit'
-        response = EnergyUtils.send_http_request(url, json.dumps(param), {'Content-Type': 'application/json'})
-
-        if response:
-            try:
-                result = json.loads(response)
-                if result.get('status') == 200:
-                    return {'success': True, 'order_no': result['data']['order_no']}
-                else:
-                    return {'success': False, 'message': result.get('msg', '下单失败')}
-            except json.JSONDecodeError:
-                return {'success': False, 'message': 'API响应解析失败'}
-        else:
-            return {'success': False, 'message': 'API请求失败'}
+        return self.update_transaction_status(transaction, 9, '笔数套餐购买成功', current_time)
 
-    def place_rent_energy_order(self, platform, address, energy_amount, energy_day):
-        """调用RentEnergysBot API"""
-        energy_type = 'day' if energy_day == 1 else ('3day' if energy_day == 3 else 'hour')
-        energy_amount = max(energy_amount, 33000)
-
-        url = (
-            f"https://api.wallet.buzz?api=getEnergy&apikey={platform['platform_apikey']}"
-            f"&address={address}&amount={energy_amount}&type={energy_type}"
-        )
-
-        response = EnergyUtils.send_http_request(url)
-
-        if response:
-            try:
-                result = json.loads(response)
-                if result.get('status') == 'success':
-                    return {'success': True, 'txid': result['txid']}
-                else:
-                    return {'success': False, 'message': '下单失败'}
-            except json.JSONDecodeError:
-                return {'success': False, 'message': 'API响应解析失败'}
-        else:
-            return {'success': False, 'message': 'API请求失败'}
-
-    def place_self_stake_order(self, platform, address, energy_amount):
-        """自己质押代理"""
-        params = {
-            'pri': platform['platform_apikey'],
-            'fromaddress': platform['platform_uid'],
-            'receiveaddress': address,
-            'resourcename': 'ENERGY',
-            'resourceamount': energy_amount,
-            'resourcetype': 1,
-            'permissionid': platform['permission_id']
-        }
-
-        response = EnergyUtils.send_http_request('energy_stake_api_url', params)
-
-        if response:
-            try:
-                result = json.loads(response)
-                if result.get('code') == 200:
-                    return {
-                        'success': True,
-                        'txid': result['data']['txid'],
-                        'use_trx': result['data']['use_trx']
-                    }
-                else:
-                    return {'success': False, 'message': '质押失败'}
-            except json.JSONDecodeError:
-                return {'success': False, 'message': 'API响应解析失败'}
-        else:
-            return {'success': False, 'message': 'API请求失败'}
-
-    def place_trongas_order(self, platform, address, energy_amount, energy_day):
-        """调用trongas.io API"""
-        rent_time = energy_day if energy_day == 1 else (72 if energy_day == 3 else 1)
-
-        param = {
-            "username": platform['platform_uid'],
-            "password": platform['platform_apikey'],
-            "resType": "ENERGY",
-            "payNums": energy_amount,
-            "rentTime": rent_time,
-            "resLock": 0,
-            "receiveAddress": address
-        }
-
-        url = 'https://trongas.io/api/pay'
-        response = EnergyUtils.send_http_request(url, param)
-
-        if response:
-            try:
-                result = json.loads(response)
-                if result.get('code') == 10000:
-                    return {
-                        'success': True,
-                        'order_id': result['data']['orderId'],
-                        'order_money': result['data']['orderMoney']
-                    }
-                else:
-                    return {'success': False, 'message': '下单失败'}
-            except json.JSONDecodeError:
-                return {'success': False, 'message': 'API响应解析失败'}
-        else:
-            return {'success': False, 'message': 'API请求失败'}
-
-    def create_platform_order(self, platform, transaction, energy_amount, package, current_time):
-        """创建平台订单"""
+    def create_platform_order(self, platform, transaction, energy_amount, package, current_time, source_type=2):
+        """创建平台订单 (source_type: 2-自动下单，4-对冲重复下单待对账)"""
         order_data = {
             'energy_platform_rid': platform['rid'],
             'energy_platform_bot_rid': transaction['platform_bot_rid'],
@@ -273,7 +189,7 @@ class HandleEnergyOrderTask:
             'energy_amount': energy_amount,
             'energy_day': package['energy_day'],
             'energy_time': current_time,
-            'source_type': 2,  # 自动下单
+            'source_type': source_type,
             'recovery_status': 2 if platform['platform_name'] == 3 else 1,
             'use_trx': transaction.get('use_trx', 0)
         }
@@ -281,8 +197,17 @@ class HandleEnergyOrderTask:
         order_model = EnergyPlatformOrderModel()
         return order_model.insert(order_data)
 
-    def update_transaction_status(self, rid, status, comments, current_time, platform_rid=None, package_rid=None):
-        """更新交易状态"""
+    def renew_lease(self, transaction):
+        """续约交易租约"""
+        model = EnergyWalletTradeListModel()
+        if model.renew_lease(transaction['rid'], transaction['worker_id'], TASK_CONFIG['order_claim']['lease_seconds']):
+            return True
+
+        EnergyUtils.log('HANDLE_ENERGY_ORDER', f"交易 {transaction['rid']} 租约已失效，跳过")
+        return False
+
+    def update_transaction_status(self, transaction, status, comments, current_time, platform_rid=None, package_rid=None):
+        """更新交易状态 (仅当交易仍由本次认领持有)，更新成功返回 True"""
         update_data = {
             'process_status': status,
             'process_comments': comments,
@@ -296,4 +221,8 @@ class HandleEnergyOrderTask:
             update_data['energy_package_rid'] = package_rid
 
         model = EnergyWalletTradeListModel()
-        model.update(rid, update_data)
+        if model.finish_transaction(transaction['rid'], transaction['worker_id'], update_data):
+            return True
+
+        EnergyUtils.log('HANDLE_ENERGY_ORDER', f"交易 {transaction['rid']} 租约已失效，处理结果未写入: {comments}")
+        return False
@@ -0,0 +1,37 @@
+"""
+区块扫描入账任务
+"""
+
+from energy_rental_bot.services.energy_services import EnergyWalletServices, EnergyBlockScanServices
+from energy_rental_bot.utils.energy_utils import EnergyUtils
+
+
+class ScanEnergyWalletBlockTask:
+    """区块扫描入账任务 - 扫描新区块/USDT事件，一次覆盖全部收款钱包"""
+
+    def execute(self):
+        """执行任务"""
+        wallet_service = EnergyWalletServices()
+        wallet_list = wallet_service.get_id_list(3)  # 获取定时任务过滤状态的钱包
+
+        if not wallet_list:
+            return
+
+        wallet_map = {wallet['receive_wallet']: wallet for wallet in wallet_list}
+        scan_service = EnergyBlockScanServices(wallet_map)
+
+        try:
+            # TRX转账
+            trx_count = scan_service.scan_trx_blocks()
+            if trx_count:
+                EnergyUtils.log('BLOCK_SCAN', f'区块扫描新增TRX交易 {trx_count} 笔')
+        except Exception as e:
+            EnergyUtils.log('BLOCK_SCAN_ERROR', f'TRX区块扫描异常: {str(e)}')
+
+        try:
+            # USDT转账
+            usdt_count = scan_service.scan_usdt_events()
+            if usdt_count:
+                EnergyUtils.log('BLOCK_SCAN', f'区块扫描新增USDT交易 {usdt_count} 笔')
+        except Exception as e:
+            EnergyUtils.log('BLOCK_SCAN_ERROR', f'USDT事件扫描异常: {str(e)}')
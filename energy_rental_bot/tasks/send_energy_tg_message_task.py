@@ -2,13 +2,12 @@
 发送能量TG消息任务
 """
 
-import json
 import logging
-from urllib.parse import quote
 from energy_rental_bot.models.energy_models import (
     EnergyWalletTradeListModel,
     EnergyAiTrusteeshipModel,
-    EnergyAiBishuModel
+    EnergyAiBishuModel,
+    EnergyTgOutboxModel
 )
 from energy_rental_bot.utils.energy_utils import EnergyUtils
 from energy_rental_bot.config.config import TELEGRAM_CONFIG
@@ -48,9 +47,24 @@ class SendEnergyTgMessageTask:
         notifications = model.get_tg_notifications('self_order')
 
         for item in notifications:
-            self.send_tg_message(item, 'self_order')
-            self.update_notification_status(item['rid'], 'receive')
+            self.send_claimed_self_order_notification(item)
+
+    def send_self_order_notification(self, rid):
+        """发送单笔自助下单通知 (供事件管道调用)"""
+        item = EnergyWalletTradeListModel().get_tg_notification_by_rid(rid)
+        if item:
+            self.send_claimed_self_order_notification(item)
+
+    def send_claimed_self_order_notification(self, item):
+        """在数据库中认领通知后写入发件箱 (事件管道、轮询补偿与多实例之间只发送一次)，写入失败时撤销认领"""
+        model = EnergyWalletTradeListModel()
+        if not model.claim_tg_notification(item['rid']):
+            return
+
+        if self.send_tg_message(item, 'self_order'):
             self.update_notification_status(item['rid'], 'send')
+        else:
+            model.release_tg_notification(item['rid'])
 
     def send_trusteeship_notifications(self):
         """发送智能托管通知 - 已禁用"""
@@ -63,14 +77,14 @@ class SendEnergyTgMessageTask:
         notifications = model.get_for_notification()
 
         for item in notifications:
-            self.send_tg_message(item, 'bishu')
-            self.update_bishu_notification_status(item['rid'])
+            if self.send_tg_message(item, 'bishu'):
+                self.update_bishu_notification_status(item['rid'])
 
     def send_tg_message(self, item, message_type):
-        """发送TG消息"""
+        """发送TG消息，写入发件箱成功返回 True"""
         if not item:
             self.logger.error("发送TG消息失败：item为空")
-            return
+            return False
 
         message = self.build_message(item, message_type)
         keyboard = self.build_keyboard(item)
@@ -83,9 +97,9 @@ class SendEnergyTgMessageTask:
 
         if not chat_id or not bot_token:
             self.logger.error(f"发送TG消息失败：缺少必要字段 chat_id={chat_id}, bot_token={'***' if bot_token else None}")
-            return
+            return False
 
-        self.send_to_telegram(bot_token, chat_id, message, keyboard)
+        return self.send_to_telegram(bot_token, chat_id, message, keyboard)
 
     def build_message(self, item, message_type):
         """构建消息内容"""
@@ -170,7 +184,7 @@ class SendEnergyTgMessageTask:
         }
 
     def send_to_telegram(self, bot_token, chat_id, message, keyboard):
-        """发送消息到Telegram"""
+        """发送消息到Telegram (写入发件箱)，写入成功返回 True"""
         try:
             # 只检查明显的占位符token，移除其他测试模式检测
             is_placeholder_token = (
@@ -181,18 +195,18 @@ class SendEnergyTgMessageTask:
 
             if is_placeholder_token:
                 self.logger.warning(f"[配置错误] Bot token未配置或为占位符，无法发送消息")
-                return
+                return False
 
-            # 发送真实的Telegram消息
-            url = (
-                f"https://api.telegram.org/bot{bot_token}/sendMessage"
-                f"?chat_id={chat_id}&text={quote(message)}&parse_mode=HTML&reply_markup={quote(json.dumps(keyboard))}"
-            )
-            # 使用 GET 请求通常更稳定用于简单发送，或者确保 POST 数据正确
-            response = EnergyUtils.send_http_request(url)
-            self.logger.info(f"✅ 成功发送Telegram消息到 chat_id={chat_id}")
+            # 写入发件箱，由发件箱发送器限速发送并在成功后标记已发送
+            if not EnergyTgOutboxModel().enqueue(bot_token, chat_id, message, keyboard):
+                self.logger.error(f"写入Telegram发件箱失败 chat_id={chat_id}")
+                return False
+
+            self.logger.info(f"已加入Telegram发件箱 chat_id={chat_id}")
+            return True
         except Exception as e:
-            self.logger.error(f"HTTP请求发送失败: {str(e)}")
+            self.logger.error(f"写入Telegram发件箱失败: {str(e)}")
+            return False
 
     def update_notification_status(self, rid, status_type):
         """更新通知状态"""
@@ -0,0 +1,147 @@
+"""
+Telegram发件箱发送器
+"""
+
+import json
+import math
+import asyncio
+from energy_rental_bot.models.energy_models import AsyncEnergyTgOutboxModel
+from energy_rental_bot.config.config import TASK_CONFIG
+from energy_rental_bot.utils.energy_utils import EnergyUtils, HttpClient, TokenBucket, LruCache
+
+
+class TelegramOutboxSender:
+    """Telegram发件箱发送器 - 按机器人/会话令牌桶限速，429时按 retry_after 延后，发送成功后才标记已发送"""
+
+    API_URL = 'https://api.telegram.org/bot{token}/sendMessage'
+
+    def __init__(self):
+        self.config = TASK_CONFIG['tg_outbox']
+        self.model = AsyncEnergyTgOutboxModel()
+        self.bot_buckets = {}
+        self.chat_buckets = LruCache(10000)
+        self.tasks = set()
+        self.semaphore = asyncio.Semaphore(self.config['concurrency'])
+        self.running = False
+
+    async def run(self):
+        """循环发送到期消息"""
+        self.running = True
+        EnergyUtils.log('TG_OUTBOX', '发件箱发送器已启动')
+
+        while self.running:
+            try:
+                await self.send_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                EnergyUtils.log('TG_OUTBOX', f'发送失败: {str(e)}')
+            await asyncio.sleep(self.config['poll_interval'])
+
+    def stop(self):
+        """停止发送 (未发送的消息保留在发件箱中)"""
+        self.running = False
+
+    async def send_due(self):
+        """认领并发送一批到期消息 (每次认领使用新的认领标识，只读回本次认领的消息，仍在发送中的消息不会被重复调度)"""
+        claim_token = EnergyUtils.new_claim_token()
+        rows = await self.model.claim_due(claim_token, self.config['lease_seconds'], self.config['batch_size'])
+        if not rows:
+            return
+
+        # 不等待本批全部完成，慢会话不阻塞下一轮
+        for row in rows:
+            chat_bucket = self.get_chat_bucket(row['bot_token'], row['chat_id'])
+
+            # 会话积压过多时放回发件箱，避免认领的消息在内存中长时间排队
+            backlog = -chat_bucket.available() / self.config['chat_rate']
+            if backlog >= self.config['max_chat_wait']:
+                await self.model.defer(row['rid'], row['worker_id'], math.ceil(backlog))
+                continue
+
+            task = asyncio.create_task(self.send_row(row, chat_bucket.reserve()))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def get_bot_bucket(self, bot_token):
+        """获取机器人令牌桶"""
+        bucket = self.bot_buckets.get(bot_token)
+        if bucket is None:
+            rate = self.config['bot_rate']
+            bucket = self.bot_buckets[bot_token] = TokenBucket(rate, rate)
+        return bucket
+
+    def get_chat_bucket(self, bot_token, chat_id):
+        """获取会话令牌桶"""
+        key = (bot_token, chat_id)
+        bucket = self.chat_buckets.get(key)
+        if bucket is None:
+            rate = self.config['chat_rate']
+            bucket = TokenBucket(rate, 1)
+            self.chat_buckets.set(key, bucket)
+        return bucket
+
+    async def send_row(self, row, chat_wait):
+        """等待会话令牌后发送单条消息并更新发件箱状态 (等待会话令牌时不占用并发名额，繁忙会话不阻塞其他会话)"""
+        try:
+            if chat_wait > 0:
+                await asyncio.sleep(chat_wait)
+
+            async with self.semaphore:
+                await self.get_bot_bucket(row['bot_token']).acquire_async()
+                await self.deliver(row)
+        except Exception as e:
+            # 未更新状态的消息在租约到期后重新认领发送
+            EnergyUtils.log('TG_OUTBOX', f"消息 {row['rid']} 状态更新失败: {str(e)}")
+
+    async def deliver(self, row):
+        """调用Telegram接口，按响应决定标记已发送、延后重试或失败"""
+        payload = {
+            'chat_id': row['chat_id'],
+            'text': row['message'],
+            'parse_mode': 'HTML'
+        }
+        if row.get('reply_markup'):
+            payload['reply_markup'] = json.loads(row['reply_markup'])
+
+        try:
+            response = await HttpClient.request_async(
+                self.API_URL.format(token=row['bot_token']), payload, None, 'POST'
+            )
+        except Exception as e:
+            await self.retry(row, self.get_backoff(row), f'请求异常: {str(e)}')
+            return
+
+        try:
+            result = response.json()
+        except ValueError:
+            result = {}
+
+        if response.status_code == 200 and result.get('ok'):
+            await self.model.mark_sent(row['rid'], row['worker_id'])
+            return
+
+        description = result.get('description') or f'HTTP {response.status_code}'
+
+        if response.status_code == 429:
+            retry_after = (result.get('parameters') or {}).get('retry_after') or self.config['retry_delay']
+            # 机器人整体被限流时暂停该机器人的全部发送
+            self.get_bot_bucket(row['bot_token']).reserve(retry_after * self.config['bot_rate'])
+            # 限流不计入失败次数
+            await self.retry(row, retry_after, description, count_attempt=False)
+        elif 400 <= response.status_code < 500:
+            # 会话不存在、用户屏蔽机器人等，重试无意义
+            await self.model.mark_failed(row['rid'], row['worker_id'], description)
+            EnergyUtils.log('TG_OUTBOX', f"消息 {row['rid']} 发送失败: {description}")
+        else:
+            await self.retry(row, self.get_backoff(row), description)
+
+    def get_backoff(self, row):
+        """指数退避重试间隔"""
+        return self.config['retry_delay'] * (2 ** (row.get('attempts') or 0))
+
+    async def retry(self, row, delay, error, count_attempt=True):
+        """延后重试"""
+        max_attempts = self.config['max_attempts'] if count_attempt else None
+        await self.model.mark_retry(row['rid'], row['worker_id'], delay, error, max_attempts)
+        EnergyUtils.log('TG_OUTBOX', f"消息 {row['rid']} {int(delay)} 秒后重试: {error}")
@@ -4,15 +4,26 @@
 
 import os
 import time
+import uuid
+import socket
 import math
+import hashlib
+import asyncio
 import requests
 import random
+import functools
+import threading
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from http.cookiejar import DefaultCookiePolicy
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 import mysql.connector
 from mysql.connector import pooling
+import aiomysql
 # 导入配置
-from energy_rental_bot.config.config import TRON_CONFIG, DATABASE_CONFIG
+from energy_rental_bot.config.config import TRON_CONFIG, DATABASE_CONFIG, TASK_CONFIG, HTTP_CONFIG
 
 
 class EnergyUtils:
@@ -23,6 +34,11 @@ class EnergyUtils:
         """计算金额（处理小数位）"""
         return amount / math.pow(10, decimals)
 
+    @staticmethod
+    def new_claim_token():
+        """生成认领标识 (主机名:进程号:随机串)，用于多实例/多线程认领待处理交易"""
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
     @staticmethod
     def thirteen_time():
         """获取十三位时间戳"""
@@ -34,26 +50,16 @@ class EnergyUtils:
         return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
     @staticmethod
-    def send_http_request(url, data=None, headers=None, method='GET'):
+    def send_http_request(url, data=None, headers=None, method='GET', timeout=None):
         """发送HTTP请求"""
+        # 携带TRON API Key的请求，记录该key的健康状况
+        api_key = headers.get('TRON-PRO-API-KEY') if headers else None
+        started = time.monotonic()
+        status_code = None
+
         try:
-            if headers is None:
-                headers = {}
-
-            # 设置 User-Agent 避免部分API拦截
-            if 'User-Agent' not in headers:
-                headers['User-Agent'] = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
-
-            if data is not None:
-                if method.upper() == 'POST':
-                    if isinstance(data, dict):
-                        response = requests.post(url, json=data, headers=headers, timeout=10)
-                    else:
-                        response = requests.post(url, data=data, headers=headers, timeout=10)
-                else:
-                    response = requests.get(url, params=data, headers=headers, timeout=10)
-            else:
-                response = requests.get(url, headers=headers, timeout=10)
+            response = HttpClient.request(url, data, headers, method, timeout)
+            status_code = response.status_code
 
             # 只有 4xx 和 5xx 抛出异常
             response.raise_for_status()
@@ -65,10 +71,18 @@ class EnergyUtils:
         except Exception as e:
             EnergyUtils.log('HTTP_REQUEST_ERROR', f'请求失败: {str(e)}')
             return None
+        finally:
+            if api_key:
+                ApiKeyPool.record(api_key, status_code, time.monotonic() - started)
 
     @staticmethod
-    def get_random_api_key(key_type):
-        """获取随机API密钥"""
+    async def send_http_request_async(url, data=None, headers=None, method='GET', timeout=None):
+        """发送HTTP请求 (异步版本，复用同一连接池)"""
+        return await HttpClient.run_async(EnergyUtils.send_http_request, url, data, headers, method, timeout)
+
+    @staticmethod
+    def get_api_keys(key_type):
+        """获取有效的API密钥列表"""
         # 从环境变量获取 API Key
         if key_type == 'tronapikey':
             keys = [
@@ -83,10 +97,16 @@ class EnergyUtils:
                 os.getenv('GRID_API_KEY_3')
             ]
         else:
-            return None
+            return []
 
         # 过滤掉空值和无效的key
-        valid_keys = [k for k in keys if k and k not in ['key1', 'key2', 'key3', 'your_tron_api_key_1', 'your_tron_api_key_2', 'your_tron_api_key_3']]
+        placeholder_keys = ['key1', 'key2', 'key3', 'key4', 'key5', 'key6']
+        return [k for k in keys if k and k not in placeholder_keys and not k.startswith('your_')]
+
+    @staticmethod
+    def get_random_api_key(key_type):
+        """获取随机API密钥 (跳过隔离中的key)"""
+        valid_keys = ApiKeyPool.get_available_keys(key_type)
 
         if valid_keys:
             return random.choice(valid_keys)
@@ -94,6 +114,45 @@ class EnergyUtils:
         # 如果没有有效key，返回None，让调用方处理
         return None
 
+    @staticmethod
+    def acquire_api_key(key_type):
+        """获取剩余额度最多的API密钥，额度不足时阻塞到有可用令牌为止"""
+        api_key, wait = ApiKeyRateLimiter.reserve(key_type, ApiKeyPool.get_available_keys(key_type))
+        if wait > 0:
+            time.sleep(wait)
+        return api_key
+
+    @staticmethod
+    async def acquire_api_key_async(key_type):
+        """获取剩余额度最多的API密钥 (异步版本)"""
+        api_key, wait = ApiKeyRateLimiter.reserve(key_type, ApiKeyPool.get_available_keys(key_type))
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return api_key
+
+    @staticmethod
+    def hex_to_base58(hex_address):
+        """TRON十六进制地址转Base58地址"""
+        if not hex_address:
+            return ''
+
+        if hex_address.startswith('0x'):
+            hex_address = hex_address[2:]
+        if len(hex_address) == 40:
+            hex_address = '41' + hex_address
+
+        raw = bytes.fromhex(hex_address)
+        data = raw + hashlib.sha256(hashlib.sha256(raw).digest()).digest()[:4]
+
+        alphabet = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+        num = int.from_bytes(data, 'big')
+        encoded = ''
+        while num > 0:
+            num, rem = divmod(num, 58)
+            encoded = alphabet[rem] + encoded
+
+        return '1' * (len(data) - len(data.lstrip(b'\0'))) + encoded
+
     @staticmethod
     def log(title, message):
         """日志记录"""
@@ -128,22 +187,437 @@ class EnergyUtils:
         )
 
 
-# 协程并发类 (模拟异步并发)
+# HTTP客户端 (进程内共享，按主机复用 keep-alive 连接)
+class HttpClient:
+    """共享HTTP客户端"""
+
+    _session = None
+    _executor = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_session(cls):
+        """获取共享会话 (首次调用时创建)"""
+        if cls._session is None:
+            with cls._lock:
+                if cls._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=HTTP_CONFIG['pool_connections'],
+                        pool_maxsize=HTTP_CONFIG['pool_maxsize']
+                    )
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    # 会话在线程间共享，不保存任何cookie，避免不同接口间串用
+                    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                    cls._session = session
+        return cls._session
+
+    @classmethod
+    def get_executor(cls):
+        """获取异步请求使用的线程池"""
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(
+                        max_workers=HTTP_CONFIG['async_workers'],
+                        thread_name_prefix='http'
+                    )
+        return cls._executor
+
+    @classmethod
+    def request(cls, url, data=None, headers=None, method='GET', timeout=None):
+        """发送请求并返回响应对象 (网络异常时抛出)"""
+        if headers is None:
+            headers = {}
+
+        # 设置 User-Agent 避免部分API拦截
+        if 'User-Agent' not in headers:
+            headers['User-Agent'] = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
+
+        if timeout is None:
+            timeout = (HTTP_CONFIG['connect_timeout'], HTTP_CONFIG['read_timeout'])
+
+        session = cls.get_session()
+        if data is not None:
+            if method.upper() == 'POST':
+                if isinstance(data, dict):
+                    return session.post(url, json=data, headers=headers, timeout=timeout)
+                return session.post(url, data=data, headers=headers, timeout=timeout)
+            return session.get(url, params=data, headers=headers, timeout=timeout)
+        return session.get(url, headers=headers, timeout=timeout)
+
+    @classmethod
+    async def request_async(cls, url, data=None, headers=None, method='GET', timeout=None):
+        """发送请求并返回响应对象 (异步版本)"""
+        return await cls.run_async(cls.request, url, data, headers, method, timeout)
+
+    @classmethod
+    async def run_async(cls, func, *args):
+        """在HTTP线程池中执行阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls.get_executor(), functools.partial(func, *args))
+
+
+# 令牌桶限流
+class TokenBucket:
+    """令牌桶 (线程安全)"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        """按时间补充令牌"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        """当前可用令牌数 (被预占时为负数)"""
+        with self.lock:
+            self.refill()
+            return self.tokens
+
+    def reserve(self, tokens=1):
+        """预占令牌，返回需要等待的秒数"""
+        with self.lock:
+            self.refill()
+            self.tokens -= tokens
+            return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """获取令牌，不足时阻塞"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1):
+        """获取令牌 (异步版本)"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class ApiKeyRateLimiter:
+    """API Key 限流器 - 每个key一个令牌桶，优先分配剩余额度最多的key"""
+
+    _buckets = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_bucket(cls, key_type, api_key):
+        """获取key对应的令牌桶"""
+        bucket_key = (key_type, api_key)
+        with cls._lock:
+            bucket = cls._buckets.get(bucket_key)
+            if bucket is None:
+                limit = TRON_CONFIG['rate_limits'][key_type]
+                if api_key:
+                    bucket = TokenBucket(limit['rate'], limit['burst'])
+                else:
+                    # 没有配置key时按匿名额度限流
+                    bucket = TokenBucket(limit['anonymous_rate'], 1)
+                cls._buckets[bucket_key] = bucket
+        return bucket
+
+    @classmethod
+    def reserve(cls, key_type, keys):
+        """选出剩余额度最多的key并预占一个令牌，返回 (key, 需等待秒数)"""
+        if key_type not in TRON_CONFIG['rate_limits']:
+            return (random.choice(keys) if keys else None), 0
+
+        candidates = keys or [None]
+        api_key = max(candidates, key=lambda k: cls.get_bucket(key_type, k).available())
+        return api_key, cls.get_bucket(key_type, api_key).reserve()
+
+
+class ApiKeyPool:
+    """API Key 池 - 缓存key列表，记录每个key的成功率/延迟/429次数，隔离失效的key"""
+
+    _keys = {}
+    _stats = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_keys(cls, key_type):
+        """获取全部key (首次调用时从环境变量加载并缓存)"""
+        keys = cls._keys.get(key_type)
+        if keys is None:
+            with cls._lock:
+                keys = cls._keys.get(key_type)
+                if keys is None:
+                    keys = EnergyUtils.get_api_keys(key_type)
+                    for api_key in keys:
+                        cls._stats.setdefault(api_key, cls.new_stats(key_type))
+                    cls._keys[key_type] = keys
+        return keys
+
+    @classmethod
+    def reload(cls):
+        """重新加载key (修改环境变量后调用)"""
+        with cls._lock:
+            cls._keys = {}
+
+    @staticmethod
+    def new_stats(key_type):
+        """初始化key统计"""
+        return {
+            'key_type': key_type,
+            'requests': 0,
+            'success': 0,
+            'failures': 0,
+            'rate_limited': 0,
+            'unauthorized': 0,
+            'avg_latency': 0.0,
+            'consecutive_failures': 0,
+            'quarantine_until': 0.0
+        }
+
+    @classmethod
+    def get_available_keys(cls, key_type):
+        """获取未被隔离的key；全部被隔离时返回最早解除隔离的key"""
+        keys = cls.get_keys(key_type)
+        if not keys:
+            return []
+
+        now = time.monotonic()
+        with cls._lock:
+            available = [k for k in keys if cls._stats[k]['quarantine_until'] <= now]
+            if available:
+                return available
+            return [min(keys, key=lambda k: cls._stats[k]['quarantine_until'])]
+
+    @classmethod
+    def record(cls, api_key, status_code, latency):
+        """记录一次请求结果 (status_code 为 None 表示网络异常；只有 429、401/403、5xx 和网络异常计为key失败)"""
+        config = TRON_CONFIG['key_health']
+
+        with cls._lock:
+            stats = cls._stats.get(api_key)
+            if stats is None:
+                return
+
+            stats['requests'] += 1
+            if stats['requests'] == 1:
+                stats['avg_latency'] = latency
+            else:
+                stats['avg_latency'] += (latency - stats['avg_latency']) * config['latency_alpha']
+
+            if status_code is not None and status_code < 400:
+                stats['success'] += 1
+                stats['consecutive_failures'] = 0
+                return
+
+            # 其他4xx（地址/参数错误等）与key无关，不计成功也不计失败
+            if status_code is not None and 400 <= status_code < 500 and status_code not in (401, 403, 429):
+                return
+
+            stats['failures'] += 1
+            stats['consecutive_failures'] += 1
+
+            if status_code == 429:
+                stats['rate_limited'] += 1
+                backoff = config['rate_limited_backoff']
+            elif status_code in (401, 403):
+                stats['unauthorized'] += 1
+                backoff = config['unauthorized_backoff']
+            elif stats['consecutive_failures'] >= config['failure_threshold']:
+                backoff = config['rate_limited_backoff']
+            else:
+                return
+
+            # 连续失败时隔离时间指数增长
+            backoff = min(backoff * 2 ** (stats['consecutive_failures'] - 1), config['max_backoff'])
+            stats['quarantine_until'] = time.monotonic() + backoff
+
+        EnergyUtils.log('API_KEY_QUARANTINE', f'{cls.mask(api_key)} 状态码 {status_code}，隔离 {int(backoff)} 秒')
+
+    @staticmethod
+    def mask(api_key):
+        """key脱敏"""
+        return f"{api_key[:4]}****{api_key[-4:]}" if len(api_key) > 8 else '****'
+
+    @classmethod
+    def get_stats(cls):
+        """获取key统计 (key脱敏显示)"""
+        now = time.monotonic()
+        with cls._lock:
+            return [
+                {
+                    'api_key': cls.mask(api_key),
+                    'key_type': stats['key_type'],
+                    'requests': stats['requests'],
+                    'success_rate': (
+                        round(stats['success'] / (stats['success'] + stats['failures']), 4)
+                        if stats['success'] + stats['failures'] else None
+                    ),
+                    'avg_latency_ms': int(stats['avg_latency'] * 1000),
+                    'rate_limited': stats['rate_limited'],
+                    'unauthorized': stats['unauthorized'],
+                    'quarantined_seconds': max(0, int(stats['quarantine_until'] - now))
+                }
+                for api_key, stats in cls._stats.items()
+            ]
+
+
+class LruCache:
+    """线程安全的LRU缓存 - 超出容量时淘汰最久未使用的条目"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """获取缓存"""
+        with self.lock:
+            if key not in self.data:
+                return default
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def set(self, key, value):
+        """写入缓存"""
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        """删除缓存"""
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+
+class CircuitBreaker:
+    """熔断器 - 连续失败达到阈值后打开，冷却后放行探测请求（半开），探测成功后关闭"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold, recovery_timeout, half_open_probes=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probes = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """是否放行请求"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probes = 0
+
+            # 半开状态只放行有限的探测请求
+            if self.probes < self.half_open_probes:
+                self.probes += 1
+                return True
+            return False
+
+    def record_success(self):
+        """记录成功"""
+        with self.lock:
+            if self.state != self.CLOSED:
+                EnergyUtils.log('CIRCUIT_BREAKER', f'{self.name} 探测成功，熔断关闭')
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probes = 0
+
+    def record_failure(self):
+        """记录失败"""
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    EnergyUtils.log('CIRCUIT_BREAKER', f'{self.name} 连续失败 {self.failures} 次，熔断 {self.recovery_timeout} 秒')
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.probes = 0
+
+
+class CircuitBreakerRegistry:
+    """熔断器注册表 - 按名称共享熔断器"""
+
+    _breakers = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, name):
+        """获取熔断器 (不存在时按配置创建)"""
+        with cls._lock:
+            breaker = cls._breakers.get(name)
+            if breaker is None:
+                config = TASK_CONFIG['circuit_breaker']
+                breaker = CircuitBreaker(
+                    name,
+                    config['failure_threshold'],
+                    config['recovery_timeout'],
+                    config['half_open_probes']
+                )
+                cls._breakers[name] = breaker
+            return breaker
+
+    @classmethod
+    def get_states(cls):
+        """获取全部熔断器状态"""
+        with cls._lock:
+            return {name: breaker.state for name, breaker in cls._breakers.items()}
+
+
+# 并发执行类 (有界协程并发)
 class Concurrent:
-    """协程并发执行类"""
+    """并发执行类 - 最多同时运行 limit 个协程，单个任务超过 timeout 秒视为超时，异常汇总记录"""
 
-    def __init__(self, limit):
-        self.limit = limit
-        self.tasks = []
+    def __init__(self, limit=None, timeout=None):
+        concurrency_config = TASK_CONFIG['concurrency']
+        self.limit = limit or concurrency_config['max_workers']
+        self.timeout = timeout if timeout is not None else concurrency_config['timeout']
+        self.errors = []
 
-    def create(self, callable_func):
-        """创建协程任务"""
-        # 在Python中，这里应该使用asyncio
-        # 这里暂时使用同步执行作为模拟
-        try:
-            callable_func()
-        except Exception as e:
-            EnergyUtils.log('CONCURRENT_ERROR', f'协程执行异常: {str(e)}')
+    async def run(self, callables, names=None):
+        """并发执行 callables (每个返回协程)，按顺序返回结果，失败/超时的任务结果为异常对象"""
+        semaphore = asyncio.Semaphore(self.limit)
+
+        async def run_one(callable_func):
+            async with semaphore:
+                return await asyncio.wait_for(callable_func(), self.timeout)
+
+        results = await asyncio.gather(*(run_one(func) for func in callables), return_exceptions=True)
+
+        for index, result in enumerate(results):
+            if isinstance(result, asyncio.TimeoutError):
+                self.errors.append(f'任务{names[index] if names else index}: 执行超时({self.timeout}秒)')
+            elif isinstance(result, Exception):
+                self.errors.append(f'任务{names[index] if names else index}: {str(result)}')
+
+        if self.errors:
+            EnergyUtils.log('CONCURRENT_ERROR', f'{len(self.errors)}/{len(results)} 个任务异常: {"; ".join(self.errors[:10])}')
+
+        return results
 
 
 # RSA加密服务类 (模拟)
@@ -356,6 +830,62 @@ class DatabaseConnection:
 
 
 
+    def execute_many(self, sql, params_list):
+
+        """批量执行插入/更新 (executemany，INSERT会合并为多行VALUES一次提交)，返回影响行数，数据库异常返回None"""
+
+        conn = None
+
+        cursor = None
+
+        try:
+
+            conn = self.get_connection()
+
+            if not conn:
+
+                return None
+
+
+
+            cursor = conn.cursor()
+
+            cursor.executemany(sql, params_list)
+
+            return cursor.rowcount
+
+        except Exception as e:
+
+            EnergyUtils.log('DATABASE_EXECUTE_MANY_ERROR', f'SQL: {sql} | Rows: {len(params_list)} | Error: {str(e)}')
+
+            return None
+
+        finally:
+
+            # 确保资源被释放
+
+            if cursor:
+
+                try:
+
+                    cursor.close()
+
+                except:
+
+                    pass
+
+            if conn:
+
+                try:
+
+                    conn.close()
+
+                except:
+
+                    pass
+
+
+
     # 保持向后兼容的方法
 
     def connect(self):
@@ -381,3 +911,82 @@ class DatabaseConnection:
                 pass
 
             self.connection = None
+
+
+# 异步连接池 (供Telegram处理器使用，在事件循环中懒加载创建)
+async_db_pool = None
+async_db_pool_loop = None
+_async_db_pool_lock = None
+
+
+class AsyncDatabaseConnection:
+    """异步数据库连接类"""
+
+    async def get_pool(self):
+        """获取异步连接池，首次使用或事件循环变化时创建"""
+        global async_db_pool, async_db_pool_loop, _async_db_pool_lock
+
+        loop = asyncio.get_running_loop()
+        if async_db_pool is not None and async_db_pool_loop is loop:
+            return async_db_pool
+
+        if _async_db_pool_lock is None:
+            _async_db_pool_lock = asyncio.Lock()
+
+        async with _async_db_pool_lock:
+            if async_db_pool is None or async_db_pool_loop is not loop:
+                async_db_pool = await aiomysql.create_pool(
+                    host=DATABASE_CONFIG['host'],
+                    port=DATABASE_CONFIG['port'],
+                    db=DATABASE_CONFIG['database'],
+                    user=DATABASE_CONFIG['username'],
+                    password=DATABASE_CONFIG['password'],
+                    minsize=1,
+                    maxsize=DATABASE_CONFIG['async_pool_size'],
+                    connect_timeout=30,
+                    autocommit=True,
+                    charset='utf8mb4'
+                )
+                async_db_pool_loop = loop
+
+        return async_db_pool
+
+    async def query(self, sql, params=None):
+        """执行查询"""
+        try:
+            pool = await self.get_pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(sql, params or None)
+                    result = await cursor.fetchall()
+                    return list(result)
+        except Exception as e:
+            EnergyUtils.log('ASYNC_DATABASE_QUERY_ERROR', f'SQL: {sql} | Error: {str(e)}')
+            return []
+
+    async def execute(self, sql, params=None):
+        """执行更新/插入"""
+        try:
+            pool = await self.get_pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(sql, params or None)
+                    last_id = cursor.lastrowid
+                    affected_rows = cursor.rowcount
+
+                    # 如果是插入，返回自增ID，否则返回影响行数
+                    return last_id if last_id else affected_rows
+        except Exception as e:
+            EnergyUtils.log('ASYNC_DATABASE_EXECUTE_ERROR', f'SQL: {sql} | Error: {str(e)}')
+            return 0
+
+    @staticmethod
+    async def close_pool():
+        """关闭异步连接池"""
+        global async_db_pool, async_db_pool_loop
+
+        if async_db_pool is not None:
+            async_db_pool.close()
+            await async_db_pool.wait_closed()
+            async_db_pool = None
+            async_db_pool_loop = None